@@ -1,19 +1,23 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import multiprocessing
 import os
-import tempfile
+import threading
 import uuid
-from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
 
-from fastapi import BackgroundTasks, FastAPI, File, HTTPException, UploadFile
+import aiofiles.tempfile
+from fastapi import BackgroundTasks, FastAPI, File, HTTPException, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
+import pymupdf
 
-from .extract import extract_text_pages
-from .match import DatabaseMatcher
+from .match import load_matcher, validate_csv
 from .models import (
     FailuresResponse,
     FailureRow,
@@ -25,9 +29,18 @@ from .models import (
     StatusTotals,
     UploadResponse,
 )
-from .ocr_backend import OCRError
+from .ocr_backend import OCRError, warm_up_analyzer
+from .pdf_worker import init_pdf_worker, process_one_pdf
 from .semantic_match import process_pdf_semantic
-from .utils import ensure_storage_dir, extract_tokens, save_upload_file, write_csv
+from .task_store import TaskStore
+from .utils import (
+    copy_upload_chunks,
+    ensure_storage_dir,
+    file_digest,
+    iter_gzip_file,
+    save_upload_file_async,
+    write_csv,
+)
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -41,164 +54,205 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
 STORAGE_ROOT = Path(__file__).resolve().parent / "storage"
 ensure_storage_dir(STORAGE_ROOT)
 
+# タスク状態と結果は SQLite に置き、プロセスメモリには保持しない
+TASK_STORE = TaskStore(STORAGE_ROOT / "tasks.db")
+
+RESULT_HEADERS = ["pdf_name", "page", "token", "matched_type", "matched_hinban", "zaiku"]
+FAILURE_HEADERS = ["pdf_name", "page", "token"]
+
+
+def task_directory(task_id: str) -> Path:
+    return STORAGE_ROOT / task_id
 
-@dataclass
-class TaskState:
-    task_id: str
-    directory: Path
-    totals: StatusTotals = field(default_factory=StatusTotals)
-    progress: int = 0
-    pages: int = 0
-    results: List[ResultRow] = field(default_factory=list)
-    failures: List[FailureRow] = field(default_factory=list)
-    matcher: DatabaseMatcher | None = None
-    error: str | None = None
 
+def calc_progress(processed_pages: int, total_pages: int) -> int:
+    if total_pages == 0:
+        return 0
+    return min(100, int(processed_pages / total_pages * 100))
 
-TASKS: Dict[str, TaskState] = {}
 
+def write_task_csvs(task_id: str) -> None:
+    """SQLite から整列済みの行を流し込み、ダウンロード用 CSV を生成する"""
+    directory = task_directory(task_id)
+    write_csv(directory / "results.csv", RESULT_HEADERS, TASK_STORE.iter_results(task_id))
+    write_csv(directory / "failure.csv", FAILURE_HEADERS, TASK_STORE.iter_failures(task_id))
 
-def update_progress(state: TaskState, processed_pages: int) -> None:
-    if state.pages == 0:
-        state.progress = 0
-    else:
-        state.progress = min(100, int(processed_pages / state.pages * 100))
 
+def fail_task(task_id: str, message: str) -> None:
+    TASK_STORE.clear_rows(task_id)
+    TASK_STORE.update_task(task_id, progress=100, error=message)
 
-def process_task(task_id: str, csv_path: Path, pdf_paths: List[Path]) -> None:
-    state = TASKS[task_id]
+
+def _uses_cuda() -> bool:
+    device = os.getenv("OCR_DEVICE")
+    if device is not None:
+        return device.startswith("cuda")
+    # 未指定時は YomiToku が cuda を選ぶが、GPU が無ければ CPU にフォールバックする
     try:
-        matcher = DatabaseMatcher(csv_path)
-        state.matcher = matcher
+        import torch
+    except ImportError:
+        return False
+    return torch.cuda.is_available()
+
+
+def _pdf_worker_count() -> int:
+    configured = os.getenv("OCR_WORKERS")
+    if configured:
+        return max(1, int(configured))
+    # ワーカーごとに YomiToku を読み込むので、CUDA では同じ GPU にモデルを複数載せないよう 1 つに限る
+    if _uses_cuda():
+        return 1
+    return os.cpu_count() or 1
+
+
+_PDF_POOL: ProcessPoolExecutor | None = None
+_PDF_POOL_LOCK = threading.Lock()
+
+
+def get_pdf_pool() -> ProcessPoolExecutor:
+    """タスク間で共有する PDF 処理用プロセスプール（初回利用時に作成）"""
+    global _PDF_POOL
+    with _PDF_POOL_LOCK:
+        if _PDF_POOL is None:
+            # 親プロセスは OCR モデル（CUDA）を初期化済みのため fork ではなく spawn で起動する
+            _PDF_POOL = ProcessPoolExecutor(
+                max_workers=_pdf_worker_count(),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_pdf_worker,
+            )
+        return _PDF_POOL
+
+
+def _discard_pdf_pool(pool: ProcessPoolExecutor) -> None:
+    """壊れたプールを捨て、次のタスクで作り直させる"""
+    global _PDF_POOL
+    with _PDF_POOL_LOCK:
+        if _PDF_POOL is pool:
+            _PDF_POOL = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+@app.on_event("startup")
+def load_ocr_model() -> None:
+    try:
+        warm_up_analyzer()
+    except Exception:
+        # OCR が使えなくてもテキスト PDF の処理は可能なので起動は継続する
+        logger.warning("YomiToku analyzer could not be preloaded", exc_info=True)
+
+
+@app.on_event("shutdown")
+def shutdown_pdf_pool() -> None:
+    global _PDF_POOL
+    with _PDF_POOL_LOCK:
+        pool, _PDF_POOL = _PDF_POOL, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def process_task(
+    task_id: str, csv_path: Path, pdf_paths: List[Path], csv_digest: str | None = None
+) -> None:
+    try:
+        # matcher の組み立てはワーカー側で行うので、ここではヘッダーだけ確認する
+        validate_csv(csv_path)
+        csv_digest = csv_digest or file_digest(csv_path)
     except Exception as exc:
-        state.error = f"CSVの読み込みに失敗しました: {exc}"
-        state.progress = 100
+        fail_task(task_id, f"CSVの読み込みに失敗しました: {exc}")
         logger.exception("Failed to load CSV for task %s", task_id)
         return
 
-    total_pages = 0
+    page_counts: Dict[Path, int] = {}
     for pdf_path in pdf_paths:
         try:
-            from PyPDF2 import PdfReader  # type: ignore
-
-            reader = PdfReader(str(pdf_path))
-            count = len(reader.pages)
+            with pymupdf.open(str(pdf_path)) as doc:
+                count = doc.page_count
         except Exception:
             count = 0
-        total_pages += max(count, 1)
-    state.pages = total_pages
+        page_counts[pdf_path] = max(count, 1)
+    total_pages = sum(page_counts.values())
+    TASK_STORE.update_task(task_id, pages=total_pages)
 
     processed_pages = 0
-    results: List[ResultRow] = []
-    failures: List[FailureRow] = []
-
-    for pdf_path in pdf_paths:
-        try:
-            page_texts = extract_text_pages(pdf_path)
-        except OCRError as exc:
-            state.error = str(exc)
-            logger.exception("OCR error for %s", pdf_path.name)
-            break
-        except Exception as exc:
-            state.error = f"PDF処理中にエラーが発生しました: {exc}"
-            logger.exception("Unexpected error while processing %s", pdf_path.name)
-            break
-
-        pdf_name = pdf_path.name
-        for page_index, text in enumerate(page_texts, start=1):
-            tokens = extract_tokens(text)
-            if tokens:
-                state.totals.tokens += len(tokens)
-            for token in tokens:
-                hinban_matches, kidou_matches = matcher.match_token(token)
-                matched = False
-                for row in hinban_matches:
-                    results.append(
-                        ResultRow(
-                            pdf_name=pdf_name,
-                            page=page_index,
-                            token=token,
-                            matched_type="hinban",
-                            matched_hinban=row.hinban,
-                            zaiku=row.zaiku,
-                        )
-                    )
-                    state.totals.hit_hinban += 1
-                    matched = True
-                if kidou_matches:
-                    for row in kidou_matches:
-                        results.append(
-                            ResultRow(
-                                pdf_name=pdf_name,
-                                page=page_index,
-                                token=token,
-                                matched_type="spec",
-                                matched_hinban=row.hinban,
-                                zaiku=row.zaiku,
-                            )
-                        )
-                        state.totals.hit_spec += 1
-                        matched = True
-                if not matched:
-                    failures.append(
-                        FailureRow(pdf_name=pdf_name, page=page_index, token=token)
-                    )
-                    state.totals.fail += 1
-            processed_pages += 1
-            update_progress(state, processed_pages)
-
-    if state.error:
-        state.progress = 100
-        state.results = []
-        state.failures = []
-        return
-
-    results.sort(key=lambda r: (r.pdf_name, r.page, r.matched_type))
-    failures.sort(key=lambda r: (r.pdf_name, r.page))
+    task_totals = StatusTotals()
+    error: str | None = None
 
-    state.results = results
-    state.failures = failures
-    state.progress = 100
+    # OCR・照合は CPU バウンドのため PDF 単位で共有プロセスプールに投げる。
+    # matcher はワーカー側（app.pdf_worker）で読み込むので DataFrame を pickle しない。
+    executor = get_pdf_pool()
+    futures: Dict = {}
+    try:
+        futures = {
+            executor.submit(process_one_pdf, pdf_path, csv_path, csv_digest): pdf_path
+            for pdf_path in pdf_paths
+        }
+        for future in as_completed(futures):
+            pdf_path = futures[future]
+            try:
+                pdf_results, pdf_failures, totals = future.result()
+            except BrokenProcessPool:
+                raise
+            except OCRError as exc:
+                error = str(exc)
+                logger.exception("OCR error for %s", pdf_path.name)
+                break
+            except Exception as exc:
+                error = f"PDF処理中にエラーが発生しました: {exc}"
+                logger.exception("Unexpected error while processing %s", pdf_path.name)
+                break
+
+            TASK_STORE.insert_results(task_id, pdf_results)
+            TASK_STORE.insert_failures(task_id, pdf_failures)
+            task_totals.tokens += totals.tokens
+            task_totals.hit_hinban += totals.hit_hinban
+            task_totals.hit_spec += totals.hit_spec
+            task_totals.fail += totals.fail
+            processed_pages += page_counts[pdf_path]
+            TASK_STORE.update_task(
+                task_id, totals=task_totals, progress=calc_progress(processed_pages, total_pages)
+            )
+    except BrokenProcessPool as exc:
+        error = f"PDF処理中にエラーが発生しました: {exc}"
+        logger.exception("PDF worker pool broke while processing task %s", task_id)
+        _discard_pdf_pool(executor)
+    except Exception as exc:
+        error = f"PDF処理中にエラーが発生しました: {exc}"
+        logger.exception("Unexpected error while processing task %s", task_id)
+    finally:
+        if error:
+            # 共有プールなので、このタスクの未着手分だけ取り消す
+            for pending in futures:
+                pending.cancel()
 
-    results_csv = state.directory / "results.csv"
-    failures_csv = state.directory / "failure.csv"
+    if error:
+        fail_task(task_id, error)
+        return
 
-    write_csv(
-        results_csv,
-        ["pdf_name", "page", "token", "matched_type", "matched_hinban", "zaiku"],
-        (
-            [r.pdf_name, r.page, r.token, r.matched_type, r.matched_hinban, r.zaiku or ""]
-            for r in results
-        ),
-    )
+    write_task_csvs(task_id)
+    TASK_STORE.update_task(task_id, progress=100)
 
-    write_csv(
-        failures_csv,
-        ["pdf_name", "page", "token"],
-        ([f.pdf_name, f.page, f.token] for f in failures),
-    )
 
-def process_task_semantic(task_id: str, csv_path: Path, pdf_paths: List[Path]) -> None:
-    state = TASKS[task_id]
+def process_task_semantic(
+    task_id: str, csv_path: Path, pdf_paths: List[Path], csv_digest: str | None = None
+) -> None:
     try:
         # 这里不需要 DatabaseMatcher；process_pdf_semantic 里会自己读 csv
-        import os
         base_url = os.getenv("OPENAI_BASE_URL") or os.getenv("CUSTOM_OPENAI_BASE_URL") or "https://api.openai.com/v1"
         api_key  = os.getenv("OPENAI_API_KEY")  or os.getenv("CUSTOM_OPENAI_API_KEY")
         model    = os.getenv("OPENAI_MODEL", "gpt-4.1-mini")
         timeout  = int(os.getenv("OPENAI_TIMEOUT", "60"))
 
-        all_results: List[ResultRow] = []
-        all_failures: List[FailureRow] = []
+        totals = StatusTotals()
 
         # 页数粗略统计
-        state.pages = len(pdf_paths)
+        TASK_STORE.update_task(task_id, pages=len(pdf_paths))
 
         for i, pdf_path in enumerate(pdf_paths, 1):
-            df = process_pdf_semantic(
+            rows = process_pdf_semantic(
                 pdf_path=str(pdf_path),
                 db_path=str(csv_path),
                 model=model,
@@ -206,61 +260,36 @@ def process_task_semantic(task_id: str, csv_path: Path, pdf_paths: List[Path]) -
                 api_key=api_key,
                 timeout=timeout,
                 save=False,
+                db_digest=csv_digest,
             )
 
             # 把 GPT 匹配结果映射成老的 results/failures 结构，前端不用改
             pdf_name = pdf_path.name
-            for _, r in df.iterrows():
+            results = []
+            failures = []
+            for r in rows:
                 if r["match_status"] in ("EXACT","SUBSTR","KIDOU","FUZZY"):
-                    all_results.append(
-                        ResultRow(
-                            pdf_name=pdf_name,
-                            page=1,
-                            token=str(r["input_hinban"]),
-                            matched_type="hinban",
-                            matched_hinban=str(r.get("matched_hinban") or ""),
-                            zaiku=None,
-                        )
+                    results.append(
+                        (pdf_name, 1, str(r["input_hinban"]), "hinban", str(r.get("matched_hinban") or ""), None)
                     )
-                    state.totals.hit_hinban += 1
+                    totals.hit_hinban += 1
                 else:
-                    all_failures.append(
-                        FailureRow(
-                            pdf_name=pdf_name,
-                            page=1,
-                            token=str(r["input_hinban"]),
-                        )
-                    )
-                    state.totals.fail += 1
-
-            state.totals.tokens += len(df)  # 当作“处理 token 数”
-            state.progress = int(i / max(1, len(pdf_paths)) * 100)
+                    failures.append((pdf_name, 1, str(r["input_hinban"])))
+                    totals.fail += 1
+            TASK_STORE.insert_results(task_id, results)
+            TASK_STORE.insert_failures(task_id, failures)
+
+            totals.tokens += len(rows)  # 当作“处理 token 数”
+            TASK_STORE.update_task(
+                task_id, totals=totals, progress=int(i / max(1, len(pdf_paths)) * 100)
+            )
 
         # 写 CSV，沿用旧下载按钮
-        results_csv = state.directory / "results.csv"
-        failures_csv = state.directory / "failure.csv"
-
-        write_csv(
-            results_csv,
-            ["pdf_name", "page", "token", "matched_type", "matched_hinban", "zaiku"],
-            (
-                [r.pdf_name, r.page, r.token, r.matched_type, r.matched_hinban, r.zaiku or ""]
-                for r in all_results
-            ),
-        )
-        write_csv(
-            failures_csv,
-            ["pdf_name", "page", "token"],
-            ([f.pdf_name, f.page, f.token] for f in all_failures),
-        )
-
-        state.results  = all_results
-        state.failures = all_failures
-        state.progress = 100
+        write_task_csvs(task_id)
+        TASK_STORE.update_task(task_id, progress=100)
 
     except Exception as exc:
-        state.error = f"GPT処理で失敗: {exc}"
-        state.progress = 100
+        fail_task(task_id, f"GPT処理で失敗: {exc}")
 
 
 @app.post("/api/upload", response_model=UploadResponse)
@@ -275,83 +304,115 @@ async def upload(
         raise HTTPException(status_code=400, detail="PDFファイルを少なくとも1件アップロードしてください。")
 
     task_id = uuid.uuid4().hex
-    task_dir = STORAGE_ROOT / task_id
+    task_dir = task_directory(task_id)
     ensure_storage_dir(task_dir)
 
     csv_path = task_dir / "database.csv"
-    save_upload_file(db_csv, csv_path)
+    csv_digest = await save_upload_file_async(db_csv, csv_path)
 
     pdf_paths: List[Path] = []
     for pdf_file in pdfs:
         if not pdf_file.filename or not pdf_file.filename.lower().endswith(".pdf"):
             raise HTTPException(status_code=400, detail=f"PDF形式のみ対応しています: {pdf_file.filename}")
         pdf_path = task_dir / pdf_file.filename
-        save_upload_file(pdf_file, pdf_path)
+        await save_upload_file_async(pdf_file, pdf_path)
         pdf_paths.append(pdf_path)
 
-    state = TaskState(task_id=task_id, directory=task_dir)
-    TASKS[task_id] = state
-    background_tasks.add_task(process_task_semantic, task_id, csv_path, pdf_paths)
+    TASK_STORE.create_task(task_id)
+    background_tasks.add_task(process_task_semantic, task_id, csv_path, pdf_paths, csv_digest)
 
     return UploadResponse(task_id=task_id)
 
 
 @app.get("/api/status/{task_id}", response_model=StatusResponse)
 async def get_status(task_id: str):
-    state = TASKS.get(task_id)
-    if not state:
+    record = TASK_STORE.get_task(task_id)
+    if not record:
         raise HTTPException(status_code=404, detail="該当するタスクが存在しません。")
-    if state.error:
-        raise HTTPException(status_code=500, detail=state.error)
-    return StatusResponse(progress=state.progress, totals=state.totals, pages=state.pages)
+    if record.error:
+        raise HTTPException(status_code=500, detail=record.error)
+    return StatusResponse(progress=record.progress, totals=record.totals, pages=record.pages)
 
 
+# 結果の一括取得・matcher の再構築は重いブロッキング処理なので、以下は同期関数として
+# FastAPI のスレッドプールで実行させる（イベントループを塞がない）
 @app.get("/api/results/{task_id}", response_model=ResultsResponse)
-async def get_results(task_id: str):
-    state = TASKS.get(task_id)
-    if not state:
+def get_results(task_id: str, limit: Optional[int] = None, offset: int = 0):
+    record = TASK_STORE.get_task(task_id)
+    if not record:
         raise HTTPException(status_code=404, detail="タスクが見つかりません。")
-    if state.error:
-        raise HTTPException(status_code=500, detail=state.error)
+    if record.error:
+        raise HTTPException(status_code=500, detail=record.error)
+    # SQLite 由来の値は型が確定しているので検証を省いて組み立てる
+    rows = [
+        ResultRow.model_construct(
+            pdf_name=pdf_name,
+            page=page,
+            token=token,
+            matched_type=matched_type,
+            matched_hinban=matched_hinban,
+            zaiku=zaiku,
+        )
+        for pdf_name, page, token, matched_type, matched_hinban, zaiku in TASK_STORE.iter_results(
+            task_id, limit, offset
+        )
+    ]
     download_url = f"/api/download/{task_id}?type=results"
-    return ResultsResponse(rows=state.results, download_url=download_url)
+    return ResultsResponse(rows=rows, download_url=download_url)
 
 
 @app.get("/api/failures/{task_id}", response_model=FailuresResponse)
-async def get_failures(task_id: str):
-    state = TASKS.get(task_id)
-    if not state:
+def get_failures(task_id: str, limit: Optional[int] = None, offset: int = 0):
+    record = TASK_STORE.get_task(task_id)
+    if not record:
         raise HTTPException(status_code=404, detail="タスクが見つかりません。")
-    if state.error:
-        raise HTTPException(status_code=500, detail=state.error)
+    if record.error:
+        raise HTTPException(status_code=500, detail=record.error)
+    rows = [
+        FailureRow.model_construct(pdf_name=pdf_name, page=page, token=token)
+        for pdf_name, page, token in TASK_STORE.iter_failures(task_id, limit, offset)
+    ]
     download_url = f"/api/download/{task_id}?type=failures"
-    return FailuresResponse(rows=state.failures, download_url=download_url)
+    return FailuresResponse(rows=rows, download_url=download_url)
 
 
 @app.post("/api/retry", response_model=RetryResponse)
-async def retry(request: RetryRequest):
-    state = TASKS.get(request.task_id)
-    if not state or not state.matcher:
+def retry(request: RetryRequest):
+    csv_path = task_directory(request.task_id) / "database.csv"
+    if not TASK_STORE.get_task(request.task_id) or not csv_path.exists():
         raise HTTPException(status_code=404, detail="タスクまたはデータが見つかりません。")
-    candidates = state.matcher.retry(request.token)
+    # matcher は内容をキーにしたキャッシュから取り、無ければ CSV から再構築する
+    matcher = load_matcher(csv_path)
+    candidates = matcher.retry(request.token)
     return RetryResponse(candidates=candidates)
 
 
 @app.get("/api/download/{task_id}")
-async def download_csv(task_id: str, type: str):
-    state = TASKS.get(task_id)
-    if not state:
+async def download_csv(task_id: str, type: str, request: Request):
+    if not TASK_STORE.get_task(task_id):
         raise HTTPException(status_code=404, detail="タスクが存在しません。")
+    directory = task_directory(task_id)
     file_map = {
-        "results": state.directory / "results.csv",
-        "failures": state.directory / "failure.csv",
+        "results": directory / "results.csv",
+        "failures": directory / "failure.csv",
     }
     if type not in file_map:
         raise HTTPException(status_code=400, detail="typeパラメータが不正です。")
     target = file_map[type]
     if not target.exists():
         raise HTTPException(status_code=404, detail="CSVがまだ生成されていません。")
-    return FileResponse(target, media_type="text/csv", filename=target.name)
+    if "gzip" not in request.headers.get("accept-encoding", ""):
+        return FileResponse(target, media_type="text/csv", filename=target.name)
+    # CSV は 5〜10 倍に縮むため、対応クライアントには圧縮しながら返す
+    return StreamingResponse(
+        iter_gzip_file(target),
+        media_type="text/csv",
+        headers={
+            "Content-Encoding": "gzip",
+            "Content-Disposition": f'attachment; filename="{target.name}"',
+            "Vary": "Accept-Encoding",
+        },
+    )
 
 
 @app.post("/api/semantic-match")
@@ -362,12 +423,12 @@ async def semantic_match_api(
     pdf_path = None
     csv_path = None
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as pdf_tmp:
-            pdf_tmp.write(await pdf.read())
+        async with aiofiles.tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as pdf_tmp:
             pdf_path = pdf_tmp.name
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".csv") as csv_tmp:
-            csv_tmp.write(await csv.read())
+            await copy_upload_chunks(pdf, pdf_tmp)
+        async with aiofiles.tempfile.NamedTemporaryFile(delete=False, suffix=".csv") as csv_tmp:
             csv_path = csv_tmp.name
+            csv_digest = await copy_upload_chunks(csv, csv_tmp)
 
         base_url = (
             os.getenv("OPENAI_BASE_URL")
@@ -378,7 +439,9 @@ async def semantic_match_api(
         model = os.getenv("OPENAI_MODEL", "gpt-4.1-mini")
         timeout = int(os.getenv("OPENAI_TIMEOUT", "60"))
 
-        df = process_pdf_semantic(
+        # OCR と API 呼び出しはブロッキングなのでイベントループ外で実行する
+        return await asyncio.to_thread(
+            process_pdf_semantic,
             pdf_path=pdf_path,
             db_path=csv_path,
             model=model,
@@ -386,8 +449,8 @@ async def semantic_match_api(
             api_key=api_key,
             timeout=timeout,
             save=False,
+            db_digest=csv_digest,
         )
-        return df.to_dict(orient="records")
     except RuntimeError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
     except Exception as exc:  # pragma: no cover - unexpected runtime
@@ -2,73 +2,92 @@
 from __future__ import annotations
 
 import logging
+import string
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Iterator, List
 
+import ahocorasick
 import pandas as pd
+from rapidfuzz import fuzz, process
 
-from .utils import extract_tokens, normalize_text
+from .utils import DigestCache, _normalize_text, extract_tokens, file_digest, is_token, normalize_text
 
 logger = logging.getLogger(__name__)
 
+# TOKEN_PATTERN と同じ文字種。ヒット前後がこれらならトークンの一部とみなし採用しない
+_TOKEN_CHARS = frozenset(string.ascii_uppercase + string.digits + "-_/")
 
-@dataclass
+# 内容ごとに保持する matcher の数（タスク完了後も残るのはこの件数まで）
+MATCHER_CACHE_SIZE = 2
+
+# retry の類似候補（rapidfuzz の ratio, 0-100）
+RETRY_FUZZY_LIMIT = 10
+RETRY_FUZZY_CUTOFF = 70
+
+
+@dataclass(slots=True, frozen=True)
 class MatchRow:
     hinban: str
     kidou: str
     zaiku: str | None = None
 
 
+def _read_csv(csv_path: Path, nrows: int | None = None) -> pd.DataFrame:
+    encodings_to_try = [None, "utf-8-sig", "cp932", "shift_jis", "utf-16", "utf-16le", "utf-16be"]
+    last_error: UnicodeDecodeError | None = None
+    # 关键：强制按字符串读，并马上 fillna("")
+    read_kwargs = {"dtype": str, "keep_default_na": False, "nrows": nrows}
+    for encoding in encodings_to_try:
+        try:
+            if encoding is None:
+                return pd.read_csv(csv_path, **read_kwargs).fillna("")
+            return pd.read_csv(csv_path, encoding=encoding, **read_kwargs).fillna("")
+        except UnicodeDecodeError as exc:  # pragma: no cover
+            last_error = exc
+            logger.debug("Failed to decode %s with encoding %s", csv_path, encoding)
+    logger.warning(
+        "Falling back to replacement characters when decoding %s due to encoding error: %s",
+        csv_path,
+        last_error,
+    )
+    return pd.read_csv(csv_path, encoding="utf-8", encoding_errors="replace", **read_kwargs).fillna("")
+
+
+def _check_columns(columns) -> None:
+    if "hinban" not in columns or "kidou" not in columns:
+        raise ValueError("CSVに 'hinban' と 'kidou' 列が必要です。ファイルを確認してください。")
+
+
+def validate_csv(csv_path: Path) -> None:
+    """ヘッダーだけを読んで必須列を確認する（matcher は組み立てない）"""
+    _check_columns(_read_csv(csv_path, nrows=0).columns)
+
+
 class DatabaseMatcher:
     def __init__(self, csv_path: Path) -> None:
         self.csv_path = csv_path
         self.hinban_map: Dict[str, MatchRow] = {}
         self.kidou_map: Dict[str, List[MatchRow]] = {}
         self._load()
+        self._automaton = self._build_automaton()
+        self._hinban_keys: List[str] = list(self.hinban_map)
 
     def _load(self) -> None:
-        encodings_to_try = [None, "utf-8-sig", "cp932", "shift_jis", "utf-16", "utf-16le", "utf-16be"]
-        df = None
-        last_error: UnicodeDecodeError | None = None
-        for encoding in encodings_to_try:
-            try:
-                # 关键：强制按字符串读，并马上 fillna("")
-                read_kwargs = {"dtype": str}
-                if encoding is not None:
-                    read_kwargs["encoding"] = encoding
-                df = pd.read_csv(self.csv_path, **read_kwargs).fillna("")
-                break
-            except UnicodeDecodeError as exc:  # pragma: no cover
-                last_error = exc
-                logger.debug("Failed to decode %s with encoding %s", self.csv_path, encoding)
-        if df is None:
-            logger.warning(
-                "Falling back to replacement characters when decoding %s due to encoding error: %s",
-                self.csv_path,
-                last_error,
-            )
-            df = pd.read_csv(self.csv_path, dtype=str, encoding="utf-8", encoding_errors="replace").fillna("")
-
-        if "hinban" not in df.columns or "kidou" not in df.columns:
-            raise ValueError("CSVに 'hinban' と 'kidou' 列が必要です。ファイルを確認してください。")
-
-        has_zaiku = "zaiku" in df.columns
-
-        for _, row in df.iterrows():
-            # 统一正规化键
-            hinban_raw = (row.get("hinban") or "").strip()
-            kidou_raw  = (row.get("kidou")  or "").strip()
-
-            hinban = normalize_text(hinban_raw)
-            kidou  = normalize_text(kidou_raw)
-
+        df = _read_csv(self.csv_path)
+        _check_columns(df.columns)
+
+        # 列単位で正規化してから 1 回だけ Python ループを回す（iterrows は遅い）
+        # 読み込み時の値はほぼ一意なので lru_cache を経由しない
+        hinbans = df["hinban"].str.strip().map(_normalize_text).to_numpy()
+        kidous = df["kidou"].str.strip().map(_normalize_text).to_numpy()
+        if "zaiku" in df.columns:
             # 在庫不要 normalize；清洗 + 兜底，避免 "nan"/空串
-            zaiku_raw = (row.get("zaiku") or "") if has_zaiku else ""
-            zaiku = zaiku_raw.strip()
-            if zaiku == "" or zaiku.lower() == "nan":
-                zaiku = None  # 后续由 API/DF 层兜底成 "-"
+            zaikus = [z if z and z.lower() != "nan" else None for z in df["zaiku"].str.strip()]
+        else:
+            zaikus = [None] * len(df)
 
+        for hinban, kidou, zaiku in zip(hinbans, kidous, zaikus):
             match_row = MatchRow(hinban=hinban, kidou=kidou, zaiku=zaiku)
 
             if hinban:
@@ -78,22 +97,61 @@ class DatabaseMatcher:
             for token in extract_tokens(kidou):
                 self.kidou_map.setdefault(token, []).append(match_row)
 
-    def match_token(self, token: str) -> tuple[List[MatchRow], List[MatchRow]]:
-        normalized = normalize_text(token)
-        hinban_matches: List[MatchRow] = []
-        kidou_matches: List[MatchRow] = []
-
-        row = self.hinban_map.get(normalized)
-        if row:
-            hinban_matches.append(row)
-
-        kidou_matches = self.kidou_map.get(normalized, [])
-        return hinban_matches, kidou_matches
-
-    def retry(self, token: str) -> List[str]:
+    def _build_automaton(self) -> ahocorasick.Automaton:
+        automaton = ahocorasick.Automaton()
+        # 値にはキー自体を入れ、品番・規格のどちらに属するかはヒット時に両 map を引いて判定する。
+        # トークン単位の照合と同じ結果にするため、トークンになり得ない品番（数字なし・4 文字未満・
+        # 空白入り・BLACKLIST）は登録しない。規格キーは extract_tokens 由来なので常にトークン。
+        for key in self.hinban_map:
+            if is_token(key):
+                automaton.add_word(key, key)
+        for key in self.kidou_map:
+            automaton.add_word(key, key)
+        automaton.make_automaton()
+        return automaton
+
+    def iter_matches(self, text: str) -> Iterator[str]:
+        """テキストを 1 回走査し、トークン境界で一致した DB キーを出現順に返す"""
+        if len(self._automaton) == 0:
+            return
+        normalized = _normalize_text(text)
+        last = len(normalized) - 1
+        for end, key in self._automaton.iter(normalized):
+            start = end - len(key) + 1
+            if start > 0 and normalized[start - 1] in _TOKEN_CHARS:
+                continue
+            if end < last and normalized[end + 1] in _TOKEN_CHARS:
+                continue
+            yield key
+
+    def retry(self, token: str, fuzzy: bool = True) -> List[str]:
+        """完全一致（品番・規格）を先頭に、fuzzy=True なら類似品番を類似度順に続けて返す"""
         normalized = normalize_text(token)
         candidates: List[str] = []
         if normalized in self.hinban_map:
             candidates.append(self.hinban_map[normalized].hinban)
         candidates.extend({row.hinban for row in self.kidou_map.get(normalized, [])})
-        return sorted(set(candidates))
+        exact = sorted(set(candidates))
+        if not fuzzy or not normalized:
+            return exact
+
+        similar = process.extract(
+            normalized,
+            self._hinban_keys,
+            scorer=fuzz.ratio,
+            limit=RETRY_FUZZY_LIMIT,
+            score_cutoff=RETRY_FUZZY_CUTOFF,
+        )
+        return exact + [key for key, _, _ in similar if key not in exact]
+
+
+_MATCHERS: DigestCache[DatabaseMatcher] = DigestCache(MATCHER_CACHE_SIZE)
+
+
+def load_matcher(csv_path: Path, digest: str | None = None) -> DatabaseMatcher:
+    """
+    CSV の内容をキーにキャッシュした matcher を返す（同じ DB を再アップロードした場合に再利用される）。
+    digest はアップロード時に計算したものを渡す。省略時はファイルから計算する。
+    """
+    csv_path = Path(csv_path)
+    return _MATCHERS.get_or_create(digest or file_digest(csv_path), lambda: DatabaseMatcher(csv_path))
@@ -1,11 +1,15 @@
 from __future__ import annotations
 
 import logging
-from typing import List
+import os
+import threading
+import unicodedata
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List
 
-from pdf2image import convert_from_path
-from PIL import Image
 import numpy as np
+import pymupdf
 
 logger = logging.getLogger(__name__)
 
@@ -18,22 +22,20 @@ class OCRError(RuntimeError):
 # ---------------------------
 # 预处理 & 规范化
 # ---------------------------
-def preprocess_image(image: Image.Image) -> np.ndarray:
+def preprocess_image(image: np.ndarray) -> np.ndarray:
     """温和预处理：灰度 + 轻度去噪 + 轻微对比增强（不做二值化，避免细字丢失）"""
     import cv2  # 延迟导入，避免环境没装时影响模块加载
-    img = np.array(image)
-    gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+    gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
     # 轻度降噪，保边
     gray = cv2.bilateralFilter(gray, d=5, sigmaColor=50, sigmaSpace=50)
-    # 轻微对比拉伸
-    gray = cv2.convertScaleAbs(gray, alpha=1.15, beta=0)
+    # 轻微对比拉伸（原地写回，避免再分配一整页缓冲）
+    cv2.convertScaleAbs(gray, dst=gray, alpha=1.15, beta=0)
     # 还原成3通道，兼容下游
     return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
 
 
 def _normalize_visible_text(s: str) -> str:
     """OCR后统一规范：全角→半角，压空白，转大写"""
-    import unicodedata
     if not s:
         return ""
     s = unicodedata.normalize("NFKC", s)
@@ -165,8 +167,42 @@ def _run_tesseract(np_img: np.ndarray) -> str:
     return _normalize_visible_text(text)
 
 
-def ocr_pages(pdf_path: str, dpi: int = 300) -> List[str]:
-    """把 PDF 每页转图识别，返回每页合并后的文本（已做全角转半角和大写）"""
+# DocumentAnalyzer は GPU 上でスレッドセーフとは限らないため推論呼び出しのみ直列化する
+_ANALYZER_SEM = threading.Semaphore(1)
+
+# 预处理图的识别结果短于该长度时，才对原图再跑一次 YomiToku
+_RAW_RETRY_MIN_LEN = 40
+
+
+def _ocr_one_page(analyzer, raw_np: np.ndarray, idx: int) -> str:
+    """1ページ分の前処理 + OCR。前処理と tesseract はセマフォの外で並列に走る"""
+    processed = preprocess_image(raw_np)
+
+    # 1) YomiToku 路线：先跑预处理图，结果太短时才补跑原图，取更长
+    best_yomi = ""
+    try:
+        with _ANALYZER_SEM:
+            best_yomi = _run_yomitoku(analyzer, processed)
+            if len(best_yomi) < _RAW_RETRY_MIN_LEN:
+                best_yomi = max((best_yomi, _run_yomitoku(analyzer, raw_np)), key=len)
+    except Exception:  # pragma: no cover
+        logger.exception("YomiToku OCR failed on page %d", idx + 1)
+
+    # 2) 文本太短（<10），再用 tesseract 兜底
+    tess = _run_tesseract(processed) if len(best_yomi) < 10 else ""
+    final_text = max((best_yomi, tess), key=len)
+    del processed, raw_np
+
+    # 3) 打样日志（仅 DEBUG 时输出，避免每页同步写日志）
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("📄 Page %d sample: %r", idx + 1, final_text[:160])
+
+    return final_text
+
+
+@lru_cache(maxsize=1)
+def get_analyzer():
+    """进程内单例：模型权重只加载一次。设备由 OCR_DEVICE 指定（默认 cuda）"""
     try:
         from yomitoku import DocumentAnalyzer
     except ImportError as exc:  # pragma: no cover
@@ -174,35 +210,55 @@ def ocr_pages(pdf_path: str, dpi: int = 300) -> List[str]:
             "YomiTokuモジュールが見つかりません。ローカルにインストールし、モデルを配置してください。"
         ) from exc
 
+    device = os.getenv("OCR_DEVICE", "cuda")
     try:
-        images = convert_from_path(pdf_path, dpi=dpi)
-    except Exception as exc:  # pragma: no cover
-        raise OCRError("pdf2imageがPDFを処理できません。Popplerの導入を確認してください。") from exc
+        return DocumentAnalyzer(device=device)
+    except TypeError:  # pragma: no cover - 旧版本没有 device 参数
+        logger.warning("DocumentAnalyzer does not accept device=%r; using defaults", device)
+        return DocumentAnalyzer()
+
+
+def warm_up_analyzer() -> None:
+    """启动时加载模型并在空白图上跑一次，把首个请求的冷启动开销（权重加载、CUDA kernel 编译）提前"""
+    analyzer = get_analyzer()
+    blank = np.full((64, 64, 3), 255, dtype=np.uint8)
+    with _ANALYZER_SEM:
+        analyzer(blank)
 
-    analyzer = DocumentAnalyzer()
-    texts: List[str] = []
 
-    for idx, image in enumerate(images):
-        processed = preprocess_image(image)
-        raw_np = np.array(image)
+def render_page_images(doc: pymupdf.Document, dpi: int = 300) -> Iterator[np.ndarray]:
+    """用 MuPDF 逐页渲染成 RGB ndarray（按需生成，不落盘、不一次性占满内存）"""
+    for page in doc:
+        pix = page.get_pixmap(dpi=dpi, colorspace=pymupdf.csRGB, alpha=False)
+        yield np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
 
-        # 1) YomiToku 路线：预处理图 vs 原图，取更长
-        try:
-            yomi_processed = _run_yomitoku(analyzer, processed)
-            yomi_raw = _run_yomitoku(analyzer, raw_np)
-        except Exception:  # pragma: no cover
-            logger.exception("YomiToku OCR failed on page %d", idx + 1)
-            yomi_processed = yomi_raw = ""
 
-        best_yomi = max((yomi_processed, yomi_raw), key=len)
+def ocr_pages_from_images(images: Iterable[np.ndarray]) -> List[str]:
+    """对已渲染好的页面图做 OCR，返回每页合并后的文本（已做全角转半角和大写）"""
+    analyzer = get_analyzer()
+    texts: Dict[int, str] = {}
 
-        # 2) 文本太短（<10），再用 tesseract 兜底
-        tess = _run_tesseract(processed) if len(best_yomi) < 10 else ""
-        final_text = max((best_yomi, tess), key=len)
+    max_workers = min(8, os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for idx, image in enumerate(images):
+            futures[executor.submit(_ocr_one_page, analyzer, image, idx)] = idx
+            # 在途页数有上限，渲染跑在 OCR 前面时也不会把整本 PDF 堆进内存
+            if len(futures) >= max_workers * 2:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    texts[futures.pop(future)] = future.result()
+        for future in list(futures):
+            texts[futures.pop(future)] = future.result()
 
-        # 3) 打样日志
-        logger.info("📄 Page %d sample: %r", idx + 1, final_text[:160])
+    return [texts[idx] for idx in range(len(texts))]
 
-        texts.append(final_text)
 
-    return texts
+def ocr_pages(pdf_path: str, dpi: int = 300) -> List[str]:
+    """把 PDF 每页转图识别，返回每页合并后的文本（已做全角转半角和大写）"""
+    try:
+        doc = pymupdf.open(pdf_path)
+    except Exception as exc:  # pragma: no cover
+        raise OCRError("PDFをページ画像に変換できません。ファイルを確認してください。") from exc
+    with doc:
+        return ocr_pages_from_images(render_page_images(doc, dpi=dpi))
@@ -0,0 +1,62 @@
+"""
+PDF 処理用プロセスプールのワーカー側コード。
+spawn で起動したワーカーはこのモジュールだけを import するので、
+FastAPI アプリ・タスク DB・OpenAI SDK は読み込まない。
+"""
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+from typing import List
+
+from .extract import extract_text_pages
+from .match import load_matcher
+from .models import StatusTotals
+from .ocr_backend import warm_up_analyzer
+from .task_store import FailureTuple, ResultTuple
+from .utils import extract_tokens
+
+logger = logging.getLogger(__name__)
+
+
+def init_pdf_worker() -> None:
+    # ワーカー起動時に 1 回だけモデルを読み込み、以降のタスクで使い回す
+    try:
+        warm_up_analyzer()
+    except Exception:
+        logger.warning("YomiToku analyzer could not be preloaded in PDF worker", exc_info=True)
+
+
+def process_one_pdf(
+    pdf_path: Path, csv_path: Path, csv_digest: str
+) -> tuple[List[ResultTuple], List[FailureTuple], StatusTotals]:
+    """1 PDF 分の抽出と照合を行う"""
+    matcher = load_matcher(csv_path, csv_digest)
+    page_texts = extract_text_pages(pdf_path)
+
+    pdf_name = pdf_path.name
+    # ヒット数が多いと pydantic の検証コストが効くため、ここではタプルで溜める
+    results: List[ResultTuple] = []
+    failures: List[FailureTuple] = []
+    totals = StatusTotals()
+    for page_index, text in enumerate(page_texts, start=1):
+        # トークンは失敗一覧と件数集計のためだけに抽出する
+        tokens = extract_tokens(text)
+        totals.tokens += len(tokens)
+        matched_keys: set[str] = set()
+        for key in matcher.iter_matches(text):
+            if key in matched_keys:
+                continue
+            matched_keys.add(key)
+            row = matcher.hinban_map.get(key)
+            if row:
+                results.append((pdf_name, page_index, key, "hinban", row.hinban, row.zaiku))
+                totals.hit_hinban += 1
+            for row in matcher.kidou_map.get(key, []):
+                results.append((pdf_name, page_index, key, "spec", row.hinban, row.zaiku))
+                totals.hit_spec += 1
+        for token in tokens:
+            if token not in matched_keys:
+                failures.append((pdf_name, page_index, token))
+                totals.fail += 1
+    return results, failures, totals
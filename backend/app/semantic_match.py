@@ -1,26 +1,33 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
 import json
 import logging
+import math
 import os
 import re
 import sys
+import threading
 import time
 import unicodedata
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 from typing import Iterable, List
 
 from dotenv import load_dotenv
 load_dotenv()
 
-import pandas as pd
-from openai import OpenAI
+import ahocorasick
+import numpy as np
+from openai import AsyncOpenAI, OpenAI
+from rapidfuzz import fuzz, process
 
 from .ocr_backend import OCRError, ocr_pages
-from .match import DatabaseMatcher
+from .match import MATCHER_CACHE_SIZE, DatabaseMatcher, MatchRow, load_matcher
+from .utils import DigestCache, file_digest, to_nfkc, write_csv
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
@@ -45,7 +52,15 @@ JSON_EXTRACT_INSTRUCTIONS = """
 - 出力は関数呼び出しのみとし、説明文は出力しないでください。
 """
 
-REGEX_PATTERN = re.compile(r"[A-Z]{1,5}\d{2,6}[A-Z0-9]*")
+# NFKC 後のテキストに適用するので、全角数字などは既に ASCII になっている
+REGEX_PATTERN = re.compile(r"[A-Z]{1,5}\d{2,6}[A-Z0-9]*", re.ASCII)
+
+# API 同時呼び出し数の上限（API エンドポイント・バックグラウンドタスク共通）
+OPENAI_CONCURRENCY = int(os.getenv("OPENAI_CONCURRENCY", "4"))
+# GPT 呼び出しはすべて _get_gpt_loop() のループ上で行うので、そのループの asyncio.Semaphore で制限する。
+# （スレッド用セマフォを to_thread で待つと、待機中のチャンクが既定 executor のスレッドを占有し、
+#   許可を持つ側の接続処理（getaddrinfo も同じ executor を使う）が進まずデッドロックする）
+_OPENAI_SEM = asyncio.Semaphore(OPENAI_CONCURRENCY)
 
 
 @dataclass
@@ -60,10 +75,109 @@ class MatchResult:
     confidence: float | None = None
 
 
+EXTRACT_HEADERS = ["hinban", "normalized"]
+MATCH_HEADERS = [
+    "input_hinban",
+    "normalized",
+    "match_status",
+    "score",
+    "matched_hinban",
+    "zaiku",
+    "page",
+    "confidence",
+    "method",
+]
+
+# (match_status, score, matched_hinban, zaiku)
+MatchOutcome = tuple[str, float, str | None, str | None]
+
+MATCH_CACHE_SIZE = 50_000
+# cdist のスコア行列（行数 × DB 品番数）が大きくなり過ぎないよう、入力をこの行数ずつ処理する
+FUZZY_BLOCK_ROWS = 256
+
+
+@dataclass
+class MatcherIndex:
+    """DatabaseMatcher と、照合で毎回使う派生データ（行リスト・品番リスト）をまとめたもの"""
+
+    matcher: DatabaseMatcher
+    rows: list[MatchRow]
+    choices: list[str]
+    # 品番 -> rows 上の位置。入力文字列に含まれる品番を 1 回の走査で列挙する
+    hinban_automaton: ahocorasick.Automaton
+    # choices と同じ並びの object 配列（cdist には帯の部分配列をそのまま渡す）
+    choice_array: np.ndarray
+    # 品番を文字数順（同じ長さなら行順）に並べた位置と、その文字数。
+    # 長さ帯を searchsorted で切り出し、長さだけで候補外と分かる品番を比較前に除く
+    positions_by_length: np.ndarray
+    sorted_lengths: np.ndarray
+    # (正規化済み入力, 閾値) -> 照合結果。DB 更新時は index ごと作り直されるので自然に無効化される
+    match_cache: dict[tuple[str, float], MatchOutcome] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, matcher: DatabaseMatcher) -> MatcherIndex:
+        rows = list(matcher.hinban_map.values())
+        choices = [row.hinban for row in rows]
+        automaton = ahocorasick.Automaton()
+        for position, hinban in enumerate(choices):
+            automaton.add_word(hinban, position)
+        if choices:
+            automaton.make_automaton()
+        lengths = np.fromiter(map(len, choices), dtype=np.int64, count=len(choices))
+        positions_by_length = np.argsort(lengths, kind="stable")
+        return cls(
+            matcher=matcher,
+            rows=rows,
+            choices=choices,
+            hinban_automaton=automaton,
+            choice_array=np.array(choices, dtype=object),
+            positions_by_length=positions_by_length,
+            sorted_lengths=lengths[positions_by_length],
+        )
+
+    def positions_with_min_length(self, min_length: int) -> np.ndarray:
+        """文字数が min_length 以上の品番の位置（文字数順）"""
+        start = np.searchsorted(self.sorted_lengths, min_length, side="left")
+        return self.positions_by_length[start:]
+
+    def positions_in_length_band(self, length: int, score_cutoff: float) -> np.ndarray:
+        """
+        長さ length の入力と fuzz.ratio が score_cutoff に届き得る品番の位置を行順で返す。
+        ratio の上限は 2·min(|a|,|b|)/(|a|+|b|) なので、長さの差が大きい品番は比較するまでもない。
+        """
+        if score_cutoff <= 0:
+            # 閾値なしなら長さでは絞れない
+            return np.arange(len(self.choices))
+        # 上の上限が score_cutoff 以上になる文字数の範囲。浮動小数の誤差で取りこぼさないよう僅かに緩める
+        shortest = math.ceil((score_cutoff * length - 1e-6) / (200 - score_cutoff))
+        longest = math.floor((200 * length + 1e-6) / score_cutoff - length)
+        start = np.searchsorted(self.sorted_lengths, shortest, side="left")
+        stop = np.searchsorted(self.sorted_lengths, longest, side="right")
+        return np.sort(self.positions_by_length[start:stop])
+
+
+_INDEXES: DigestCache[MatcherIndex] = DigestCache(MATCHER_CACHE_SIZE)
+
+
+def _get_matcher_index(db_file: Path, digest: str) -> MatcherIndex:
+    return _INDEXES.get_or_create(digest, lambda: MatcherIndex.build(load_matcher(db_file, digest)))
+
+
+# str.isspace() / re の \s が空白とみなす全文字（削除用の translate テーブル）
+_WS_TABLE = dict.fromkeys(
+    map(ord, "\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f \x85\xa0\u1680\u2028\u2029\u202f\u205f\u3000"),
+    None,
+)
+_WS_TABLE.update(dict.fromkeys(range(0x2000, 0x200B), None))
+
+
 def _normalize_candidate(value: str) -> str:
-    text = unicodedata.normalize("NFKC", value)
-    text = re.sub(r"\s+", "", text)
-    return text.upper()
+    return to_nfkc(value).translate(_WS_TABLE).upper()
+
+
+def _normalize_candidate_fast(value: str) -> str:
+    """NFKC 済みのテキストから切り出したトークン用（NFKC を省略）"""
+    return value.translate(_WS_TABLE).upper()
 
 
 def _unique_items(items: Iterable[dict]) -> List[dict]:
@@ -78,185 +192,334 @@ def _unique_items(items: Iterable[dict]) -> List[dict]:
     return list(unique.values())
 
 
-def extract_hinbans_with_gpt(
-    text: str,
-    model: str,
-    base_url: str,
-    api_key: str,
-    timeout: int,
-) -> dict:
-    """
-    Returns:
-        {"method": "gpt_tool" | "regex_fallback", "items": list[dict]}
-    """
-    client = OpenAI(base_url=base_url, api_key=api_key, timeout=timeout)
-    truncated_text = text[:8000]
-    user_prompt = f"{JSON_EXTRACT_INSTRUCTIONS}\nOCRテキスト:\n```\n{truncated_text}\n```"
-
-    messages = [
-        {
-            "role": "system",
-            "content": "あなたはOCR後の照明カタログから品番を抽出する日本語テキスト解析エンジンです。",
-        },
-        {"role": "user", "content": user_prompt},
-    ]
-
-    tools = [
-        {
-            "type": "function",
-            "function": {
-                "name": "emit_items",
-                "description": "抽出した品番候補を配列として返す。",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "items": {
-                            "type": "array",
-                            "items": {
-                                "type": "object",
-                                "properties": {
-                                    "hinban": {"type": "string"},
-                                    "normalized": {"type": "string"},
-                                },
-                                "required": ["hinban", "normalized"],
-                            },
-                        }
+SYSTEM_PROMPT = "あなたはOCR後の照明カタログから品番を抽出する日本語テキスト解析エンジンです。"
+
+EMIT_ITEMS_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "emit_items",
+        "description": "抽出した品番候補を配列として返す。",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "items": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "hinban": {"type": "string"},
+                            "normalized": {"type": "string"},
+                        },
+                        "required": ["hinban", "normalized"],
                     },
-                    "required": ["items"],
-                },
+                }
             },
-        }
-    ]
-
-    backoff = 1.5
-    attempt = 0
-    max_attempts = 3
-
-    while attempt < max_attempts:
-        attempt += 1
+            "required": ["items"],
+        },
+    },
+}
+
+# 1 リクエストあたりの OCR テキスト上限（ページ境界で分割する）
+GPT_CHUNK_CHARS = 6000
+GPT_MAX_ATTEMPTS = 3
+GPT_BACKOFF = 1.5
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+BATCH_TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def _chunk_pages(pages: Iterable[str], max_chars: int = GPT_CHUNK_CHARS) -> list[str]:
+    """ページをまたいで max_chars 以下のチャンクにまとめる（長すぎるページのみページ内で分割）"""
+    chunks: list[str] = []
+    current: list[str] = []
+    size = 0
+    for page in pages:
+        for start in range(0, len(page), max_chars):
+            piece = page[start : start + max_chars]
+            if current and size + len(piece) > max_chars:
+                chunks.append("\n".join(current))
+                current, size = [], 0
+            current.append(piece)
+            size += len(piece) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+def _build_chat_request(chunk: str, model: str) -> dict:
+    user_prompt = f"{JSON_EXTRACT_INSTRUCTIONS}\nOCRテキスト:\n```\n{chunk}\n```"
+    return {
+        "model": model,
+        "temperature": 0,
+        "tools": [EMIT_ITEMS_TOOL],
+        "tool_choice": {"type": "function", "function": {"name": "emit_items"}},
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt},
+        ],
+    }
+
+
+def _parse_emit_items(args_raw: str | None) -> list[dict] | None:
+    """emit_items の引数 JSON から品番候補を取り出す。使えない応答なら None"""
+    # 留一手日志，前 400 字符
+    logger.debug("tool.arguments (first 400): %s", (args_raw or "")[:400].replace("\n", " "))
+    args = json.loads(args_raw or "{}")
+    parsed = args.get("items", [])
+    if not isinstance(parsed, list):
+        logger.warning("関数引数が配列ではありません。正規表現にフォールバックします。")
+        return None
+    normalized_items = _unique_items(parsed)
+    if not normalized_items:
+        logger.info("モデルから有効な品番が得られませんでした。正規表現にフォールバックします。")
+        return None
+    return normalized_items
+
+
+async def _extract_chunk(client: AsyncOpenAI, chunk: str, model: str) -> tuple[str, list[dict]]:
+    """1 チャンク分の抽出。失敗時はそのチャンクだけ正規表現にフォールバックする"""
+    request = _build_chat_request(chunk, model)
+    for attempt in range(1, GPT_MAX_ATTEMPTS + 1):
         try:
-            response = client.chat.completions.create(
-                model=model,
-                temperature=0,
-                tools=tools,
-                tool_choice={"type": "function", "function": {"name": "emit_items"}},
-                messages=messages,
-            )
+            async with _OPENAI_SEM:
+                response = await client.chat.completions.create(**request)
 
             choice = response.choices[0] if response.choices else None
             tool_calls = getattr(choice.message, "tool_calls", None) if choice else None
-
             if not tool_calls:
                 logger.warning("モデルが関数を呼び出しませんでした。正規表現にフォールバックします。")
-                return {"method": "regex_fallback", "items": _fallback_regex_extraction(text)}
-
+                break
             # 取第一個 tool call
-            tc = tool_calls[0]
-            args_raw = tc.function.arguments or ""
-            # 留一手日志，前 400 字符
-            logger.debug("tool.arguments (first 400): %s", args_raw[:400].replace("\n", " "))
-
-            args = json.loads(args_raw)
-            parsed = args.get("items", [])
-            if not isinstance(parsed, list):
-                logger.warning("関数引数が配列ではありません。正規表現にフォールバックします。")
-                return {"method": "regex_fallback", "items": _fallback_regex_extraction(text)}
-
-            normalized_items = _unique_items(parsed)
-            if not normalized_items:
-                logger.info("モデルから有効な品番が得られませんでした。正規表現にフォールバックします。")
-                return {"method": "regex_fallback", "items": _fallback_regex_extraction(text)}
-
-            return {"method": "gpt_tool", "items": normalized_items}
+            items = _parse_emit_items(tool_calls[0].function.arguments)
+            if items is None:
+                break
+            return "gpt_tool", items
 
         except Exception as exc:
             status_code = getattr(exc, "status_code", None) or getattr(exc, "status", None)
-            if status_code in (429, 500, 502, 503, 504) and attempt < max_attempts:
-                sleep_time = backoff ** attempt
+            if status_code in RETRYABLE_STATUS and attempt < GPT_MAX_ATTEMPTS:
+                sleep_time = GPT_BACKOFF ** attempt
                 logger.warning("OpenAI API error (status=%s). Retrying in %.1f seconds...", status_code, sleep_time)
-                time.sleep(sleep_time)
+                await asyncio.sleep(sleep_time)
                 continue
             logger.exception("OpenAI API呼び出しに失敗しました。正規表現にフォールバックします。")
-            return {"method": "regex_fallback", "items": _fallback_regex_extraction(text)}
+            break
+
+    return "regex_fallback", _fallback_regex_extraction(chunk)
+
+
+_GPT_LOOP: asyncio.AbstractEventLoop | None = None
+_GPT_LOOP_LOCK = threading.Lock()
+
+
+def _get_gpt_loop() -> asyncio.AbstractEventLoop:
+    """
+    GPT 呼び出し専用の常駐イベントループ。
+    AsyncOpenAI の接続プールは作成したループに紐づくので、呼び出し毎の asyncio.run ではなく
+    このループに投げることで、PDF をまたいで接続（TLS セッション）を使い回す。
+    """
+    global _GPT_LOOP
+    with _GPT_LOOP_LOCK:
+        if _GPT_LOOP is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="gpt-loop", daemon=True).start()
+            _GPT_LOOP = loop
+        return _GPT_LOOP
+
+
+@lru_cache(maxsize=4)
+def _get_async_client(base_url: str, api_key: str, timeout: int) -> AsyncOpenAI:
+    # _get_gpt_loop() のループ上でのみ使うこと。リトライは _extract_chunk で行うので SDK 側は無効にする
+    return AsyncOpenAI(base_url=base_url, api_key=api_key, timeout=timeout, max_retries=0)
+
+
+@lru_cache(maxsize=4)
+def _get_client(base_url: str, api_key: str, timeout: int) -> OpenAI:
+    return OpenAI(base_url=base_url, api_key=api_key, timeout=timeout)
 
-    return {"method": "regex_fallback", "items": _fallback_regex_extraction(text)}
+
+async def _extract_chunks(
+    chunks: list[str], model: str, base_url: str, api_key: str, timeout: int
+) -> list[tuple[str, list[dict]]]:
+    client = _get_async_client(base_url, api_key, timeout)
+    return await asyncio.gather(*(_extract_chunk(client, chunk, model) for chunk in chunks))
+
+
+def _merge_method(methods: Iterable[str]) -> str:
+    unique = set(methods)
+    if not unique:
+        return "regex_fallback"
+    return unique.pop() if len(unique) == 1 else "mixed"
+
+
+def extract_hinbans_with_gpt(
+    pages: List[str],
+    model: str,
+    base_url: str,
+    api_key: str,
+    timeout: int,
+) -> dict:
+    """
+    ページ境界で分割したチャンクを並行して GPT に投げ、結果を統合する。
+
+    Returns:
+        {"method": "gpt_tool" | "regex_fallback" | "mixed", "items": list[dict]}
+    """
+    chunks = _chunk_pages(pages)
+    if not chunks:
+        return {"method": "regex_fallback", "items": []}
+
+    outcomes = asyncio.run_coroutine_threadsafe(
+        _extract_chunks(chunks, model, base_url, api_key, timeout), _get_gpt_loop()
+    ).result()
+    return {
+        "method": _merge_method(method for method, _ in outcomes),
+        "items": _unique_items(item for _, items in outcomes for item in items),
+    }
 
 
 def _fallback_regex_extraction(text: str) -> list[dict]:
     normalized_text = unicodedata.normalize("NFKC", text.upper())
-    candidates = []
-    for match in REGEX_PATTERN.finditer(normalized_text):
-        token = match.group(0)
-        normalized = _normalize_candidate(token)
-        candidates.append({"hinban": token, "normalized": normalized})
+    # カタログでは同じ品番が繰り返し出るので、正規化の前に重複を落とす
+    tokens = dict.fromkeys(REGEX_PATTERN.findall(normalized_text))
+    candidates = [{"hinban": token, "normalized": _normalize_candidate_fast(token)} for token in tokens]
     return _unique_items(candidates)
 
 
+def _find_substring_rows(queries: Iterable[str], index: MatcherIndex) -> dict[str, int]:
+    """
+    各クエリについて「クエリを含む」または「クエリに含まれる」品番のうち、
+    rows 上で最初に現れるものの位置を返す（該当なしのクエリはキーに含めない）。
+    """
+    unique_queries = set(queries)
+    first: dict[str, int] = {}
+    if not unique_queries or not index.choices:
+        return first
+
+    # クエリに含まれる品番：品番オートマトンで各クエリを走査
+    for query in unique_queries:
+        for _, position in index.hinban_automaton.iter(query):
+            if position < first.get(query, len(index.choices)):
+                first[query] = position
+
+    # クエリを含む品番：クエリ側のオートマトンで、最短クエリ以上の長さの品番だけを 1 回ずつ走査
+    query_automaton = ahocorasick.Automaton()
+    for query in unique_queries:
+        query_automaton.add_word(query, query)
+    query_automaton.make_automaton()
+    min_length = min(map(len, unique_queries))
+    for position in index.positions_with_min_length(min_length).tolist():
+        for _, query in query_automaton.iter(index.choices[position]):
+            if position < first.get(query, len(index.choices)):
+                first[query] = position
+    return first
+
+
+def _match_pending(
+    queries: set[str], index: MatcherIndex, fuzzy_threshold: float
+) -> dict[str, MatchOutcome]:
+    """未照合の正規化済み入力を段階ごとにまとめて照合する（完全一致 → 子串 → 規格 → 模糊）"""
+    matcher = index.matcher
+    outcomes: dict[str, MatchOutcome] = {}
+
+    # 完全一致：ここで当たったものは以降の段階に回さない
+    pending: list[str] = []
+    for normalized in queries:
+        row = matcher.hinban_map.get(normalized)
+        if row:
+            outcomes[normalized] = ("EXACT", 1.0, row.hinban, row.zaiku or None)
+        else:
+            pending.append(normalized)
+
+    # 子串互含
+    substring_rows = _find_substring_rows(pending, index)
+    remaining: list[str] = []
+    for normalized in pending:
+        position = substring_rows.get(normalized)
+        if position is None:
+            remaining.append(normalized)
+        else:
+            candidate = index.rows[position]
+            outcomes[normalized] = ("SUBSTR", 0.9, candidate.hinban, candidate.zaiku or None)
+
+    # 规格关键字回查
+    fuzzy_queries: list[str] = []
+    for normalized in remaining:
+        retry_candidates = matcher.retry(normalized, fuzzy=False)
+        if retry_candidates:
+            matched_hinban = retry_candidates[0]
+            row2 = matcher.hinban_map.get(matched_hinban)
+            outcomes[normalized] = ("KIDOU", 0.88, matched_hinban, (row2.zaiku if row2 else None))
+        else:
+            fuzzy_queries.append(normalized)
+
+    # 模糊匹配：残りを長さごとにまとめ、届き得る長さ帯の品番だけを cdist に渡して行ごとの argmax を取る
+    score_cutoff = fuzzy_threshold * 100
+    queries_by_length: dict[int, list[str]] = {}
+    for normalized in fuzzy_queries:
+        queries_by_length.setdefault(len(normalized), []).append(normalized)
+    for length, same_length in queries_by_length.items():
+        band = index.positions_in_length_band(length, score_cutoff)
+        if not len(band):
+            continue
+        band_choices = index.choice_array[band]
+        for start in range(0, len(same_length), FUZZY_BLOCK_ROWS):
+            block = same_length[start:start + FUZZY_BLOCK_ROWS]
+            # workers=-1：rapidfuzz の C++ スレッドプールで全コアを使う（GIL は解放される）
+            scores = process.cdist(
+                block, band_choices, scorer=fuzz.ratio, score_cutoff=score_cutoff, workers=-1
+            )
+            best_indices = scores.argmax(axis=1)
+            best_scores = scores.max(axis=1)
+            for normalized, best_index, best_score in zip(block, best_indices.tolist(), best_scores.tolist()):
+                # cdist は閾値未満を 0 にするので 0 は「該当なし」。閾値 0 のときだけは 0 点でも最良候補を採る
+                if best_score > 0 or score_cutoff <= 0:
+                    best_row = index.rows[int(band[best_index])]
+                    outcomes[normalized] = (
+                        "FUZZY", round(best_score / 100, 3), best_row.hinban, best_row.zaiku or None
+                    )
+
+    for normalized in fuzzy_queries:
+        outcomes.setdefault(normalized, ("NONE", 0.0, None, None))
+    return outcomes
+
+
 def _match_semantic_items(
-    items: list[dict], matcher: DatabaseMatcher, fuzzy_threshold: float = 0.82
+    items: list[dict], index: MatcherIndex, fuzzy_threshold: float = 0.82
 ) -> list[MatchResult]:
-    all_rows = list(matcher.hinban_map.values())
-    results: list[MatchResult] = []
+    # 正規化後の値でまとめ、照合は一意な値ごとに 1 回だけ行って結果を元の各入力へ配り戻す
+    entries: list[tuple[str, str]] = []
+    normalized_by_raw: dict[str, str] = {}
     for item in items:
         hinban = str(item.get("hinban", "")).strip()
-        normalized = _normalize_candidate(item.get("normalized", hinban))
-        if not normalized:
-            continue
-
-        status = "NONE"
-        score = 0.0
-        matched_hinban: str | None = None
-        matched_zaiku: str | None = None
-
-        # 完全一致
-        row = matcher.hinban_map.get(normalized)
-        if row:
-            status = "EXACT"
-            matched_hinban = row.hinban
-            matched_zaiku = row.zaiku or None
-            score = 1.0
+        raw = item.get("normalized", hinban)
+        normalized = normalized_by_raw.get(raw)
+        if normalized is None:
+            normalized = normalized_by_raw[raw] = _normalize_candidate(raw)
+        if normalized:
+            entries.append((hinban, normalized))
+
+    # 同じ DB に対する照合済みの入力（PDF 間・PDF 内の重複）はキャッシュから返す
+    # （キャッシュは他スレッドから clear され得るので、結果はローカルの resolved から読む）
+    cache = index.match_cache
+    resolved: dict[str, MatchOutcome] = {}
+    pending: set[str] = set()
+    for normalized in dict.fromkeys(normalized for _, normalized in entries):
+        outcome = cache.get((normalized, fuzzy_threshold))
+        if outcome is None:
+            pending.add(normalized)
         else:
-            # 子串互含
-            for candidate in all_rows:
-                if normalized and normalized in candidate.hinban:
-                    status = "SUBSTR"
-                    matched_hinban = candidate.hinban
-                    matched_zaiku = candidate.zaiku or None
-                    score = 0.9
-                    break
-                if candidate.hinban and candidate.hinban in normalized:
-                    status = "SUBSTR"
-                    matched_hinban = candidate.hinban
-                    matched_zaiku = candidate.zaiku or None
-                    score = 0.9
-                    break
-
-        # 规格关键字回查
-        if status == "NONE":
-            retry_candidates = matcher.retry(normalized)
-            if retry_candidates:
-                status = "KIDOU"
-                matched_hinban = retry_candidates[0]
-                row2 = matcher.hinban_map.get(matched_hinban)
-                matched_zaiku = (row2.zaiku if row2 else None)
-                score = 0.88
-
-        # 模糊匹配
-        if status == "NONE":
-            best_ratio = 0.0
-            best_row = None
-            from difflib import SequenceMatcher
-            for candidate in all_rows:
-                ratio = SequenceMatcher(None, normalized, candidate.hinban).ratio()
-                if ratio > best_ratio:
-                    best_ratio = ratio
-                    best_row = candidate
-            if best_row and best_ratio >= fuzzy_threshold:
-                status = "FUZZY"
-                matched_hinban = best_row.hinban
-                matched_zaiku = best_row.zaiku or None
-                score = round(best_ratio, 3)
+            resolved[normalized] = outcome
+    if pending:
+        fresh = _match_pending(pending, index, fuzzy_threshold)
+        if len(cache) + len(fresh) > MATCH_CACHE_SIZE:
+            cache.clear()
+        for normalized, outcome in fresh.items():
+            cache[(normalized, fuzzy_threshold)] = outcome
+        resolved.update(fresh)
 
+    results: list[MatchResult] = []
+    for hinban, normalized in entries:
+        status, score, matched_hinban, matched_zaiku = resolved[normalized]
         results.append(
             MatchResult(
                 input_hinban=hinban,
@@ -270,15 +533,7 @@ def _match_semantic_items(
     return results
 
 
-def process_pdf_semantic(
-    pdf_path: str,
-    db_path: str,
-    model: str,
-    base_url: str,
-    api_key: str | None,
-    timeout: int,
-    save: bool,
-) -> pd.DataFrame:
+def _resolve_credentials(base_url: str | None, api_key: str | None) -> tuple[str, str]:
     resolved_base_url = (
         base_url
         or os.getenv("OPENAI_BASE_URL")
@@ -294,22 +549,21 @@ def process_pdf_semantic(
         message = "OpenAI APIキーが設定されていません。"
         logger.error(message)
         raise RuntimeError(message)
+    return resolved_base_url, resolved_api_key
 
-    pdf_file = Path(pdf_path)
-    if not pdf_file.exists():
-        message = f"PDFファイルが見つかりません: {pdf_path}"
-        logger.error(message)
-        raise RuntimeError(message)
 
-    db_file = Path(db_path)
-    if not db_file.exists():
-        message = f"CSVファイルが見つかりません: {db_path}"
+def _require_file(path: str, label: str) -> Path:
+    file = Path(path)
+    if not file.exists():
+        message = f"{label}が見つかりません: {path}"
         logger.error(message)
         raise RuntimeError(message)
+    return file
 
-    # OCR
+
+def _ocr_pdf(pdf_file: Path) -> list[str]:
     try:
-        texts = ocr_pages(str(pdf_file))
+        return ocr_pages(str(pdf_file))
     except OCRError as exc:
         message = f"OCR処理に失敗しました: {exc}"
         logger.error(message)
@@ -319,104 +573,274 @@ def process_pdf_semantic(
         logger.error(message)
         raise RuntimeError(message) from exc
 
-    # OCRテキスト結合
-    ocr_text = "\n".join(texts)
 
-    # GPT抽出（関数呼び出し方式）
-    logger.info("🧠 GPTで品番を抽出中...")
-    result = extract_hinbans_with_gpt(
-        text=ocr_text,
-        model=model,
-        base_url=resolved_base_url,
-        api_key=resolved_api_key,
-        timeout=timeout,
-    )
-    method = result.get("method", "unknown")
-    items = result.get("items", [])
+def _load_index(db_file: Path, digest: str | None = None) -> MatcherIndex:
+    try:
+        return _get_matcher_index(db_file, digest or file_digest(db_file))
+    except ValueError as exc:
+        message = str(exc)
+        logger.error(message)
+        raise RuntimeError(message) from exc
+
+
+def _write_lines(lines: list[str]) -> None:
+    # 行ごとの print はロック取得・フラッシュが重いので、まとめて 1 回で書き出す
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
+
 
+def _report_and_match(
+    items: list[dict], method: str, index: MatcherIndex, save: bool, log_tag: str = ""
+) -> list[dict]:
+    """抽出結果の表示・保存、DB照合、照合結果の表示・保存をまとめて行う"""
     # 抽出結果の表示 + 保存（method 付き）
-    title = "🧠 GPT抽出結果 (Function Call)" if method == "gpt_tool" else "🧪 正規表現抽出（フォールバック）"
-    print(f"\n=== {title} ===")
+    title = {
+        "gpt_tool": "🧠 GPT抽出結果 (Function Call)",
+        "mixed": "🧠 GPT抽出結果 (一部チャンクは正規表現にフォールバック)",
+    }.get(method, "🧪 正規表現抽出（フォールバック）")
+    lines = [f"\n=== {title} ==="]
     if not items:
-        print("⚠️ 抽出結果が空です。")
+        lines.append("⚠️ 抽出結果が空です。")
     else:
-        for i, item in enumerate(items, 1):
-            print(f"{i:02d}. {item.get('hinban', '')}  →  {item.get('normalized', '')}")
-    print("=" * 60)
+        lines.extend(
+            f"{i:02d}. {item.get('hinban', '')}  →  {item.get('normalized', '')}"
+            for i, item in enumerate(items, 1)
+        )
+    lines.append("=" * 60)
+    _write_lines(lines)
 
     logs_dir = Path("logs")
     logs_dir.mkdir(parents=True, exist_ok=True)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    gpt_csv_path = logs_dir / f"extract_{method}_{timestamp}.csv"
-    pd.DataFrame(items).to_csv(gpt_csv_path, index=False, encoding="utf-8-sig")
+    suffix = f"{log_tag}_{timestamp}" if log_tag else timestamp
+    gpt_csv_path = logs_dir / f"extract_{method}_{suffix}.csv"
+    write_csv(
+        gpt_csv_path,
+        EXTRACT_HEADERS,
+        ((item.get("hinban", ""), item.get("normalized", "")) for item in items),
+        encoding="utf-8-sig",
+    )
     logger.info("💾 抽出結果を保存しました: %s", gpt_csv_path)
 
     # DB照合
-    try:
-        matcher = DatabaseMatcher(db_file)
-    except ValueError as exc:
-        message = str(exc)
-        logger.error(message)
-        raise RuntimeError(message) from exc
-
-    match_results = _match_semantic_items(items, matcher)
+    match_results = _match_semantic_items(items, index)
 
     # 照合結果の表示（在庫付き）
-    print("\n=== 🔎 照合結果 ===")
-    for result in match_results:
-        matched = result.matched_hinban or "-"
-        z = result.zaiku or "-"
-        print(f"{result.match_status:<6} | {result.input_hinban:<20} -> {matched:<20} | 在庫={z:<10} | score={result.score:0.3f}")
-
-    # DataFrame（在庫列付き）
-    df = pd.DataFrame(
-        [
-            {
-                "input_hinban": r.input_hinban,
-                "normalized": r.normalized,
-                "match_status": r.match_status,
-                "score": r.score,
-                "matched_hinban": r.matched_hinban,
-                "zaiku": r.zaiku,
-                "page": r.page,
-                "confidence": r.confidence,
-                "method": method,
-            }
-            for r in match_results
-        ]
+    lines = ["\n=== 🔎 照合結果 ==="]
+    lines.extend(
+        " | ".join(
+            (
+                result.match_status.ljust(6),
+                result.input_hinban.ljust(20) + " -> " + (result.matched_hinban or "-").ljust(20),
+                "在庫=" + (result.zaiku or "-").ljust(10),
+                f"score={result.score:0.3f}",
+            )
+        )
+        for result in match_results
     )
+    _write_lines(lines)
+
+    # 照合結果の行（在庫列付き）
+    rows = [
+        {
+            "input_hinban": r.input_hinban,
+            "normalized": r.normalized,
+            "match_status": r.match_status,
+            "score": r.score,
+            "matched_hinban": r.matched_hinban,
+            "zaiku": r.zaiku,
+            "page": r.page,
+            "confidence": r.confidence,
+            "method": method,
+        }
+        for r in match_results
+    ]
 
     if save:
-        output_path = logs_dir / f"match_{method}_{timestamp}.csv"
-        df.to_csv(output_path, index=False, encoding="utf-8-sig")
+        output_path = logs_dir / f"match_{method}_{suffix}.csv"
+        write_csv(
+            output_path,
+            MATCH_HEADERS,
+            ((row[header] for header in MATCH_HEADERS) for row in rows),
+            encoding="utf-8-sig",
+        )
         logger.info("💾 照合結果を保存しました: %s", output_path)
 
-    return df
+    return rows
+
+
+def process_pdf_semantic(
+    pdf_path: str,
+    db_path: str,
+    model: str,
+    base_url: str,
+    api_key: str | None,
+    timeout: int,
+    save: bool,
+    db_digest: str | None = None,
+) -> list[dict]:
+    """db_digest はアップロード時に計算した CSV のダイジェスト（省略時はファイルから計算する）"""
+    resolved_base_url, resolved_api_key = _resolve_credentials(base_url, api_key)
+    pdf_file = _require_file(pdf_path, "PDFファイル")
+    db_file = _require_file(db_path, "CSVファイル")
+
+    # OCR
+    texts = _ocr_pdf(pdf_file)
+
+    # GPT抽出（関数呼び出し方式）
+    logger.info("🧠 GPTで品番を抽出中...")
+    result = extract_hinbans_with_gpt(
+        pages=texts,
+        model=model,
+        base_url=resolved_base_url,
+        api_key=resolved_api_key,
+        timeout=timeout,
+    )
+    method = result.get("method", "unknown")
+    items = result.get("items", [])
+
+    return _report_and_match(items, method, _load_index(db_file, db_digest), save)
+
+
+def _run_chat_batch(client: OpenAI, requests: dict[str, dict], poll_interval: float) -> dict[str, list[dict]]:
+    """
+    Chat Completions を Batch API に一括投入し、完了を待って結果を回収する。
+
+    Returns:
+        {custom_id: 品番候補}（解釈できた応答のみ。欠けた ID は呼び出し側でフォールバックする）
+    """
+    if not requests:
+        return {}
+
+    payload = "\n".join(
+        json.dumps(
+            {"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": body},
+            ensure_ascii=False,
+        )
+        for custom_id, body in requests.items()
+    )
+    input_file = client.files.create(file=("batch_input.jsonl", payload.encode("utf-8")), purpose="batch")
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+    logger.info("📦 Batch を投入しました: %s (%d リクエスト)", batch.id, len(requests))
+
+    while batch.status not in BATCH_TERMINAL_STATUSES:
+        time.sleep(poll_interval)
+        batch = client.batches.retrieve(batch.id)
+
+    if batch.status != "completed":
+        logger.error("Batch %s が %s で終了しました。未取得分は正規表現にフォールバックします。", batch.id, batch.status)
+    if not batch.output_file_id:
+        return {}
+
+    parsed: dict[str, list[dict]] = {}
+    for line in client.files.content(batch.output_file_id).text.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        response = record.get("response") or {}
+        if response.get("status_code") != 200:
+            continue
+        try:
+            tool_calls = response["body"]["choices"][0]["message"].get("tool_calls") or []
+            if not tool_calls:
+                continue
+            items = _parse_emit_items(tool_calls[0]["function"]["arguments"])
+        except (KeyError, IndexError, ValueError):
+            logger.warning("Batch 応答を解釈できません: %s", record.get("custom_id"))
+            continue
+        if items is not None:
+            parsed[record["custom_id"]] = items
+    return parsed
+
+
+def process_pdf_semantic_batch(
+    pdf_paths: List[str],
+    db_path: str,
+    model: str,
+    base_url: str | None,
+    api_key: str | None,
+    timeout: int,
+    save: bool,
+    poll_interval: float = 30.0,
+) -> dict[str, list[dict]]:
+    """
+    複数 PDF をまとめて OpenAI Batch API で抽出するオフライン向けの入口。
+    料金が半額になり通常とは別枠のレート制限が使えるが、完了まで最大 24 時間かかる。
+
+    Returns:
+        {pdf_path: 照合結果の行（dict）のリスト}
+    """
+    resolved_base_url, resolved_api_key = _resolve_credentials(base_url, api_key)
+    pdf_files = [_require_file(path, "PDFファイル") for path in pdf_paths]
+    db_file = _require_file(db_path, "CSVファイル")
+    # OCR・Batch 投入の前に CSV の不備で落とす
+    index = _load_index(db_file)
+
+    chunks_per_pdf = [_chunk_pages(_ocr_pdf(pdf_file)) for pdf_file in pdf_files]
+    requests = {
+        f"{pdf_no}:{chunk_no}": _build_chat_request(chunk, model)
+        for pdf_no, chunks in enumerate(chunks_per_pdf)
+        for chunk_no, chunk in enumerate(chunks)
+    }
+
+    client = _get_client(resolved_base_url, resolved_api_key, timeout)
+    extracted = _run_chat_batch(client, requests, poll_interval)
+
+    results: dict[str, list[dict]] = {}
+    for pdf_no, (pdf_file, chunks) in enumerate(zip(pdf_files, chunks_per_pdf)):
+        outcomes = []
+        for chunk_no, chunk in enumerate(chunks):
+            items = extracted.get(f"{pdf_no}:{chunk_no}")
+            if items is None:
+                outcomes.append(("regex_fallback", _fallback_regex_extraction(chunk)))
+            else:
+                outcomes.append(("gpt_tool", items))
+        method = _merge_method(method for method, _ in outcomes)
+        items = _unique_items(item for _, chunk_items in outcomes for item in chunk_items)
+        results[str(pdf_file)] = _report_and_match(items, method, index, save, log_tag=pdf_file.stem)
+    return results
 
 
 def _parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Semantic matcher for hinban extraction")
-    parser.add_argument("--pdf", required=True, help="入力PDFのパス")
+    parser.add_argument("--pdf", required=True, nargs="+", help="入力PDFのパス（複数可）")
     parser.add_argument("--db", required=True, help="品番CSVのパス")
     parser.add_argument("--model", default="gpt-4o-mini", help="使用するモデル名")
     parser.add_argument("--base-url", default=None, help="OpenAI互換APIのベースURL")
     parser.add_argument("--api-key", default=None, help="OpenAI互換APIのキー")
     parser.add_argument("--timeout", type=int, default=60, help="APIタイムアウト(秒)")
     parser.add_argument("--save", action="store_true", help="結果をCSVに保存")
+    parser.add_argument("--batch", action="store_true", help="OpenAI Batch APIでまとめて抽出（完了まで最大24時間）")
     return parser.parse_args()
 
 
 if __name__ == "__main__":
     args = _parse_args()
     try:
-        process_pdf_semantic(
-            pdf_path=args.pdf,
-            db_path=args.db,
-            model=args.model,
-            base_url=args.base_url,
-            api_key=args.api_key,
-            timeout=args.timeout,
-            save=args.save,
-        )
+        if args.batch:
+            process_pdf_semantic_batch(
+                pdf_paths=args.pdf,
+                db_path=args.db,
+                model=args.model,
+                base_url=args.base_url,
+                api_key=args.api_key,
+                timeout=args.timeout,
+                save=args.save,
+            )
+        else:
+            for pdf_path in args.pdf:
+                process_pdf_semantic(
+                    pdf_path=pdf_path,
+                    db_path=args.db,
+                    model=args.model,
+                    base_url=args.base_url,
+                    api_key=args.api_key,
+                    timeout=args.timeout,
+                    save=args.save,
+                )
     except RuntimeError:
         sys.exit(1)
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+from contextlib import contextmanager
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .models import StatusTotals
+
+# (pdf_name, page, token, matched_type, matched_hinban, zaiku)
+ResultTuple = Tuple[str, int, str, str, str, Optional[str]]
+# (pdf_name, page, token)
+FailureTuple = Tuple[str, int, str]
+
+_BATCH_SIZE = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    progress INTEGER NOT NULL DEFAULT 0,
+    totals_json TEXT NOT NULL DEFAULT '{}',
+    error TEXT,
+    pages INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS results (
+    task_id TEXT NOT NULL,
+    pdf_name TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    token TEXT NOT NULL,
+    matched_type TEXT NOT NULL,
+    matched_hinban TEXT NOT NULL,
+    zaiku TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_results_task ON results (task_id, pdf_name, page, matched_type);
+CREATE TABLE IF NOT EXISTS failures (
+    task_id TEXT NOT NULL,
+    pdf_name TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    token TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_failures_task ON failures (task_id, pdf_name, page);
+"""
+
+
+@dataclass
+class TaskRecord:
+    task_id: str
+    progress: int
+    totals: StatusTotals
+    error: str | None
+    pages: int
+
+
+class TaskStore:
+    """タスクの進捗・結果を SQLite(WAL) に保存する。プロセス内にはタスクを保持しない。"""
+
+    def __init__(self, db_path: Path) -> None:
+        self.db_path = db_path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # 接続はバックグラウンドタスクのスレッドを跨がないよう呼び出し毎に開く
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def create_task(self, task_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO tasks (id, totals_json) VALUES (?, ?)",
+                (task_id, StatusTotals().model_dump_json()),
+            )
+
+    def get_task(self, task_id: str) -> TaskRecord | None:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, progress, totals_json, error, pages FROM tasks WHERE id = ?",
+                (task_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return TaskRecord(
+            task_id=row[0],
+            progress=row[1],
+            totals=StatusTotals(**json.loads(row[2])),
+            error=row[3],
+            pages=row[4],
+        )
+
+    def update_task(
+        self,
+        task_id: str,
+        *,
+        progress: int | None = None,
+        totals: StatusTotals | None = None,
+        pages: int | None = None,
+        error: str | None = None,
+    ) -> None:
+        columns: List[str] = []
+        values: list = []
+        if progress is not None:
+            columns.append("progress = ?")
+            values.append(progress)
+        if totals is not None:
+            columns.append("totals_json = ?")
+            values.append(totals.model_dump_json())
+        if pages is not None:
+            columns.append("pages = ?")
+            values.append(pages)
+        if error is not None:
+            columns.append("error = ?")
+            values.append(error)
+        if not columns:
+            return
+        with self._connect() as conn:
+            conn.execute(f"UPDATE tasks SET {', '.join(columns)} WHERE id = ?", (*values, task_id))
+
+    def insert_results(self, task_id: str, rows: Iterable[ResultTuple]) -> None:
+        self._insert_batched(
+            "INSERT INTO results (task_id, pdf_name, page, token, matched_type, matched_hinban, zaiku)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            task_id,
+            rows,
+        )
+
+    def insert_failures(self, task_id: str, rows: Iterable[FailureTuple]) -> None:
+        self._insert_batched(
+            "INSERT INTO failures (task_id, pdf_name, page, token) VALUES (?, ?, ?, ?)",
+            task_id,
+            rows,
+        )
+
+    def clear_rows(self, task_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM results WHERE task_id = ?", (task_id,))
+            conn.execute("DELETE FROM failures WHERE task_id = ?", (task_id,))
+
+    def _insert_batched(self, sql: str, task_id: str, rows: Iterable[Sequence]) -> None:
+        iterator = iter(rows)
+        with self._connect() as conn:
+            while batch := list(islice(iterator, _BATCH_SIZE)):
+                conn.executemany(sql, [(task_id, *row) for row in batch])
+
+    def iter_results(
+        self, task_id: str, limit: int | None = None, offset: int = 0
+    ) -> Iterator[ResultTuple]:
+        yield from self._select(
+            "SELECT pdf_name, page, token, matched_type, matched_hinban, zaiku FROM results"
+            " WHERE task_id = ? ORDER BY pdf_name, page, matched_type, rowid LIMIT ? OFFSET ?",
+            task_id,
+            limit,
+            offset,
+        )
+
+    def iter_failures(
+        self, task_id: str, limit: int | None = None, offset: int = 0
+    ) -> Iterator[FailureTuple]:
+        yield from self._select(
+            "SELECT pdf_name, page, token FROM failures"
+            " WHERE task_id = ? ORDER BY pdf_name, page, rowid LIMIT ? OFFSET ?",
+            task_id,
+            limit,
+            offset,
+        )
+
+    def _select(self, sql: str, task_id: str, limit: int | None, offset: int) -> Iterator[tuple]:
+        # SQLite では LIMIT -1 が無制限
+        with self._connect() as conn:
+            yield from conn.execute(sql, (task_id, -1 if limit is None else limit, offset))
@@ -1,12 +1,22 @@
+import csv
+import hashlib
 import logging
 import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
-from typing import Iterable, List, Set
+from typing import Callable, Dict, Generic, Iterable, Iterator, List, TypeVar
 import unicodedata
+import zlib
+
+import aiofiles
 
 logger = logging.getLogger(__name__)
 
-BLACKLIST = {
+T = TypeVar("T")
+
+BLACKLIST = frozenset({
     "SCALE",
     "DATE",
     "MM",
@@ -15,54 +25,123 @@ BLACKLIST = {
     "COPY",
     "SAMPLE",
     "MODEL",
-}
+})
 
-TOKEN_PATTERN = re.compile(r"[A-Z0-9][A-Z0-9\-_\/]{3,}")
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# トークンは ASCII のみなので、Unicode 判定を省く re.ASCII でマッチさせる
+TOKEN_PATTERN = re.compile(r"[A-Z0-9][A-Z0-9\-_\/]{3,}", re.ASCII)
+WHITESPACE_PATTERN = re.compile(r"\s+")
+_HAS_DIGIT = re.compile(r"[0-9]").search
+_DASH_TABLE = str.maketrans({"–": "-", "—": "-", "−": "-"})
 
 def ensure_storage_dir(path: Path) -> None:
     path.mkdir(parents=True, exist_ok=True)
 
 
-def normalize_text(value: str) -> str:
+def to_nfkc(value: str) -> str:
+    # ASCII は NFKC で変化しないので、isascii()（C レベルの判定）で正規化自体を省く
+    return value if value.isascii() else unicodedata.normalize("NFKC", value)
+
+
+def _normalize_text(value: str) -> str:
+    """キャッシュなしの正規化。ページ全文や CSV 読み込み時のような一意な値にはこちらを使う"""
     if value is None:
         return ""
-    text = unicodedata.normalize("NFKC", value)
-    text = text.upper()
-    text = text.replace("–", "-").replace("—", "-").replace("−", "-")
-    text = re.sub(r"\s+", " ", text).strip()
+    text = to_nfkc(value).upper().translate(_DASH_TABLE)
+    text = WHITESPACE_PATTERN.sub(" ", text).strip()
     return text
 
 
-def extract_tokens(text: str) -> List[str]:
-    normalized = normalize_text(text)
-    candidates: Set[str] = set()
-    for match in TOKEN_PATTERN.finditer(normalized):
-        token = match.group(0)
-        if any(char.isdigit() for char in token) and token not in BLACKLIST:
-            candidates.add(token)
-    return sorted(candidates)
+# トークン単位の繰り返し呼び出し用
+normalize_text = lru_cache(maxsize=200_000)(_normalize_text)
+
 
+def is_token(value: str) -> bool:
+    """extract_tokens が返し得る値（正規化済みの 1 トークン）かどうか"""
+    return bool(TOKEN_PATTERN.fullmatch(value)) and value not in BLACKLIST and bool(_HAS_DIGIT(value))
 
-def write_csv(path: Path, headers: Iterable[str], rows: Iterable[Iterable[str]]) -> None:
-    import csv
 
-    with path.open("w", newline="", encoding="utf-8") as fh:
+def extract_tokens(text: str) -> List[str]:
+    # ページ全文のような長い一意な文字列でキャッシュを埋めないよう、キャッシュなし版を使う
+    normalized = _normalize_text(text)
+    # 出現順のまま重複を落とす（ソートはしない）
+    candidates: Dict[str, None] = {}
+    for token in TOKEN_PATTERN.findall(normalized):
+        if token not in candidates and token not in BLACKLIST and _HAS_DIGIT(token):
+            candidates[token] = None
+    return list(candidates)
+
+
+def write_csv(
+    path: Path, headers: Iterable[str], rows: Iterable[Iterable[str]], encoding: str = "utf-8"
+) -> None:
+    with path.open("w", newline="", encoding=encoding, buffering=1 << 20) as fh:
         writer = csv.writer(fh)
         writer.writerow(headers)
-        for row in rows:
-            writer.writerow(row)
-
-
-def read_file_bytes(file) -> bytes:
-    data = file.read()
-    if hasattr(file, "seek"):
-        file.seek(0)
-    return data
-
-
-def save_upload_file(upload_file, destination: Path) -> None:
+        writer.writerows(rows)
+
+
+def iter_gzip_file(path: Path, chunk_size: int = UPLOAD_CHUNK_SIZE) -> Iterator[bytes]:
+    """ファイルを chunk_size ずつ読みながら gzip ストリームとして返す"""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    with path.open("rb") as fh:
+        while chunk := fh.read(chunk_size):
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+    yield compressor.flush()
+
+
+def _new_digest():
+    return hashlib.blake2b(digest_size=16)
+
+
+def file_digest(path: Path) -> str:
+    """ファイル内容のダイジェスト（内容をキーにするキャッシュ用）"""
+    digest = _new_digest()
+    with path.open("rb") as fh:
+        while chunk := fh.read(UPLOAD_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DigestCache(Generic[T]):
+    """
+    内容ダイジェストをキーにした小さな LRU。
+    アップロードされた CSV は一時ファイルやタスク毎の保存先に置かれパスが毎回変わるので、パスはキーにしない。
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._items: OrderedDict[str, T] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_create(self, digest: str, factory: Callable[[], T]) -> T:
+        with self._lock:
+            if digest in self._items:
+                self._items.move_to_end(digest)
+                return self._items[digest]
+        # 構築はロックの外で行う（同時にミスした場合は二重に作るだけ）
+        value = factory()
+        with self._lock:
+            self._items[digest] = value
+            self._items.move_to_end(digest)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return value
+
+
+async def copy_upload_chunks(upload_file, buffer) -> str:
+    """UploadFile を 1MB ずつ非同期ファイルへ書き出し（全体をメモリに載せない）、内容のダイジェストを返す"""
+    digest = _new_digest()
+    while chunk := await upload_file.read(UPLOAD_CHUNK_SIZE):
+        digest.update(chunk)
+        await buffer.write(chunk)
+    return digest.hexdigest()
+
+
+async def save_upload_file_async(upload_file, destination: Path) -> str:
     ensure_storage_dir(destination.parent)
-    with destination.open("wb") as buffer:
-        buffer.write(read_file_bytes(upload_file.file))
-
-
+    async with aiofiles.open(destination, "wb") as buffer:
+        return await copy_upload_chunks(upload_file, buffer)
@@ -0,0 +1,44 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from app.match import DatabaseMatcher
+
+SAMPLE_DB = Path(__file__).resolve().parents[1] / "app" / "sample_db.csv"
+
+
+def test_iter_matches_respects_token_boundaries():
+    matcher = DatabaseMatcher(SAMPLE_DB)
+    hits = list(matcher.iter_matches("ab-1234 XAB-1234 zx-9900/2 400v"))
+    assert hits == ["AB-1234", "400V"]
+    assert matcher.kidou_map["400V"][0].hinban == "AB-1234"
+
+
+def test_retry_adds_fuzzy_candidates_after_exact_hits():
+    matcher = DatabaseMatcher(SAMPLE_DB)
+    assert matcher.retry("400v") == ["AB-1234"]
+    assert matcher.retry("400v", fuzzy=False) == ["AB-1234"]
+    assert matcher.retry("ab-1243") == ["AB-1234"]
+    assert matcher.retry("ab-1243", fuzzy=False) == []
+
+
+def test_load_matcher_is_keyed_by_csv_contents(tmp_path):
+    from app.match import load_matcher
+
+    first = tmp_path / "first.csv"
+    second = tmp_path / "second.csv"
+    first.write_bytes(SAMPLE_DB.read_bytes())
+    second.write_bytes(SAMPLE_DB.read_bytes())
+    # 一時ファイルのようにパスが毎回違っても、内容が同じなら同じ matcher を返す
+    assert load_matcher(first) is load_matcher(second)
+
+    second.write_bytes(SAMPLE_DB.read_bytes() + b"QQ-0001,QQ-0001,1\n")
+    assert load_matcher(second) is not load_matcher(first)
+
+
+def test_iter_matches_ignores_hinban_that_cannot_be_a_token(tmp_path):
+    csv_path = tmp_path / "db.csv"
+    csv_path.write_text("hinban,kidou,zaiku\nLED,照明,1\nAB-12,100V,2\nNNF41030,,3\n", encoding="utf-8")
+    matcher = DatabaseMatcher(csv_path)
+    # LED は数字を含まないのでトークンにならず、トークン単位の照合と同じく一致させない
+    assert list(matcher.iter_matches("LED 照明 AB-12 NNF41030 100V")) == ["AB-12", "NNF41030", "100V"]
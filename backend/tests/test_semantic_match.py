@@ -0,0 +1,126 @@
+import json
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from app.semantic_match import MatcherIndex, _chunk_pages, _run_chat_batch
+
+
+def test_chunk_pages_splits_on_page_boundaries():
+    chunks = _chunk_pages(["a" * 3000, "b" * 2000, "c" * 2000, "d" * 13000], max_chars=6000)
+    assert chunks[0] == "a" * 3000 + "\n" + "b" * 2000
+    assert chunks[1] == "c" * 2000
+    assert all(len(chunk) <= 6000 for chunk in chunks)
+    assert "".join(chunks).replace("\n", "") == "a" * 3000 + "b" * 2000 + "c" * 2000 + "d" * 13000
+
+
+def test_chunk_pages_drops_blank_text():
+    assert _chunk_pages(["", "  \n "]) == []
+
+
+class _FakeBatchClient:
+    def __init__(self, lines):
+        self.files = SimpleNamespace(
+            create=lambda file, purpose: SimpleNamespace(id="file-in"),
+            content=lambda file_id: SimpleNamespace(text="\n".join(json.dumps(line) for line in lines)),
+        )
+        statuses = iter(["in_progress", "completed"])
+        self.batches = SimpleNamespace(
+            create=lambda **kwargs: SimpleNamespace(id="batch", status="validating", output_file_id=None),
+            retrieve=lambda batch_id: SimpleNamespace(id="batch", status=next(statuses), output_file_id="file-out"),
+        )
+
+
+def test_run_chat_batch_keeps_only_parsed_responses():
+    arguments = json.dumps({"items": [{"hinban": "AB-12", "normalized": "AB-12", "page": 1, "confidence": 0.9}]})
+    client = _FakeBatchClient(
+        [
+            {
+                "custom_id": "0:0",
+                "response": {
+                    "status_code": 200,
+                    "body": {"choices": [{"message": {"tool_calls": [{"function": {"arguments": arguments}}]}}]},
+                },
+            },
+            {"custom_id": "0:1", "response": {"status_code": 500, "body": {}}},
+        ]
+    )
+    parsed = _run_chat_batch(client, {"0:0": {}, "0:1": {}}, poll_interval=0)
+    assert list(parsed) == ["0:0"]
+    assert parsed["0:0"][0]["normalized"] == "AB-12"
+
+
+def test_positions_in_length_band_keeps_only_reachable_lengths():
+    choices = [letter * length for letter, length in zip("ABCDEFG", (15, 7, 10, 6, 14, 10, 7))]
+    matcher = SimpleNamespace(hinban_map={choice: SimpleNamespace(hinban=choice) for choice in choices})
+    index = MatcherIndex.build(matcher)
+    # 0.82 では 2·min/(和) の上限から 7〜14 文字だけが残る（位置は行順）
+    assert index.positions_in_length_band(10, 82.0).tolist() == [1, 2, 4, 5, 6]
+    assert index.positions_with_min_length(14).tolist() == [4, 0]
+
+
+def test_match_semantic_items_matches_each_normalized_value_once(monkeypatch):
+    import app.semantic_match as semantic_match
+
+    row = SimpleNamespace(hinban="AB-12", zaiku="3")
+    matcher = SimpleNamespace(hinban_map={"AB-12": row}, retry=lambda value, fuzzy: [])
+    index = MatcherIndex.build(matcher)
+    calls = []
+    original = semantic_match._match_pending
+
+    def counting_match_pending(queries, index, fuzzy_threshold):
+        calls.append(set(queries))
+        return original(queries, index, fuzzy_threshold)
+
+    monkeypatch.setattr(semantic_match, "_match_pending", counting_match_pending)
+    items = [
+        {"hinban": "AB-12"},
+        {"hinban": "ａｂ－12", "normalized": "ab-12"},
+        {"hinban": "AB-12"},
+        {"hinban": "ZZ-99"},
+    ]
+    results = semantic_match._match_semantic_items(items, index)
+
+    assert calls == [{"AB-12", "ZZ-99"}]
+    assert [result.input_hinban for result in results] == ["AB-12", "ａｂ－12", "AB-12", "ZZ-99"]
+    assert [result.match_status for result in results] == ["EXACT", "EXACT", "EXACT", "NONE"]
+
+
+def test_match_semantic_items_with_zero_threshold_takes_best_row():
+    from app.semantic_match import _match_semantic_items
+
+    row = SimpleNamespace(hinban="AB-12", zaiku=None)
+    matcher = SimpleNamespace(hinban_map={"AB-12": row}, retry=lambda value, fuzzy: [])
+    index = MatcherIndex.build(matcher)
+    assert index.positions_in_length_band(40, 0.0).tolist() == [0]
+    results = _match_semantic_items([{"hinban": "ZZZZZZZZZZZZZZZZZZZZ"}], index, fuzzy_threshold=0.0)
+    assert (results[0].match_status, results[0].matched_hinban, results[0].score) == ("FUZZY", "AB-12", 0.0)
+
+
+def test_extract_chunks_does_not_starve_default_executor(monkeypatch):
+    import asyncio
+    import time
+
+    import app.semantic_match as semantic_match
+
+    arguments = json.dumps({"items": [{"hinban": "AB-12", "normalized": "AB-12", "page": 1, "confidence": 0.9}]})
+    response = SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(tool_calls=[SimpleNamespace(function=SimpleNamespace(arguments=arguments))]))]
+    )
+
+    async def create(**request):
+        # httpx の接続処理（getaddrinfo）と同じく、既定 executor のスレッドを使う
+        await asyncio.get_running_loop().run_in_executor(None, time.sleep, 0.01)
+        return response
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(semantic_match, "_get_async_client", lambda base_url, api_key, timeout: client)
+
+    # 既定 executor のスレッド数（最大 32）より多いチャンクを同時に投げる
+    chunks = ["AB-12 " * 1000 for _ in range(80)]
+    outcomes = asyncio.run_coroutine_threadsafe(
+        semantic_match._extract_chunks(chunks, "model", "http://localhost", "key", 10), semantic_match._get_gpt_loop()
+    ).result(timeout=30)
+
+    assert [method for method, _ in outcomes] == ["gpt_tool"] * len(chunks)
@@ -0,0 +1,28 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from app.models import StatusTotals
+from app.task_store import TaskStore
+
+
+def test_rows_are_persisted_sorted_and_paginated(tmp_path):
+    store = TaskStore(tmp_path / "tasks.db")
+    store.create_task("t1")
+    store.insert_results(
+        "t1",
+        [
+            ("b.pdf", 1, "AB-1234", "hinban", "AB-1234", "25"),
+            ("a.pdf", 2, "400V", "spec", "AB-1234", None),
+            ("a.pdf", 1, "ZX-9900", "hinban", "ZX-9900", "5"),
+        ],
+    )
+    store.update_task("t1", progress=100, pages=3, totals=StatusTotals(tokens=3, hit_hinban=2))
+
+    reopened = TaskStore(tmp_path / "tasks.db")
+    record = reopened.get_task("t1")
+    assert record.progress == 100
+    assert record.totals.hit_hinban == 2
+    assert [r[:2] for r in reopened.iter_results("t1")] == [("a.pdf", 1), ("a.pdf", 2), ("b.pdf", 1)]
+    assert list(reopened.iter_results("t1", limit=1, offset=1)) == [("a.pdf", 2, "400V", "spec", "AB-1234", None)]
+    assert reopened.get_task("missing") is None
@@ -13,3 +13,22 @@ def test_normalize_and_extract():
     assert "MN-450X" in tokens
     assert "ZX_9900" in tokens
     assert "SCALE" not in tokens
+
+
+def test_iter_gzip_file_roundtrip(tmp_path):
+    import gzip
+
+    from app.utils import iter_gzip_file
+
+    path = tmp_path / "results.csv"
+    path.write_text("pdf_name,page\n" + "a.pdf,1\n" * 1000, encoding="utf-8")
+    compressed = b"".join(iter_gzip_file(path, chunk_size=64))
+    assert gzip.decompress(compressed) == path.read_bytes()
+
+
+def test_to_nfkc_skips_ascii_and_normalizes_fullwidth():
+    from app.utils import to_nfkc
+
+    ascii_text = "NNF41030 LE9"
+    assert to_nfkc(ascii_text) is ascii_text
+    assert to_nfkc("ＮＮＦ４１０３０") == "NNF41030"